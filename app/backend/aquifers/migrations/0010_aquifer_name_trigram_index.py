@@ -0,0 +1,19 @@
+# Generated by Django 2.1.7 on 2019-03-01 18:20
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aquifers', '0009_auto_20190108_1925'),
+    ]
+
+    # Trigram index for the aquifer name autocomplete (see gwells.autocomplete).
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(
+            'CREATE INDEX aquifer_name_trgm ON aquifer USING gin (aquifer_name gin_trgm_ops)',
+            'DROP INDEX aquifer_name_trgm'),
+    ]
@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth.models import User
@@ -27,3 +28,27 @@ class TestAquifersEditRole(APITestCase):
         url = reverse('aquifer-retrieve-update', kwargs={'aquifer_id': 1})
         response = self.client.patch(url, {}, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TestAquiferNameList(APITestCase):
+    def setUp(self):
+        cache.clear()
+        Aquifer(aquifer_id=1253, aquifer_name='Abbotsford').save()
+        Aquifer(aquifer_id=125, aquifer_name='Langley').save()
+        Aquifer(aquifer_id=5125, aquifer_name='Aldergrove').save()
+
+    def test_search_number_prefix(self):
+        url = reverse('aquifer-name-list')
+        response = self.client.get(url, {'search': '125'})
+        # The exact match comes first, then the aquifers whose ids start with the search. Ids that only
+        # contain the search aren't matched.
+        self.assertEqual([aquifer['aquifer_id'] for aquifer in response.data], [125, 1253])
+
+    def test_search_name(self):
+        url = reverse('aquifer-name-list')
+        response = self.client.get(url, {'search': 'abb'})
+        self.assertEqual([aquifer['aquifer_id'] for aquifer in response.data], [1253])
+        # The response is cached.
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'search': 'abb'})
+        self.assertEqual([aquifer['aquifer_id'] for aquifer in response.data], [1253])
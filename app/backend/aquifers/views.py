@@ -27,6 +27,7 @@ from rest_framework.generics import ListAPIView, ListCreateAPIView, RetrieveUpda
 
 from reversion.views import RevisionMixin
 
+from gwells.autocomplete import AutocompleteMixin
 from gwells.documents import MinioClient
 from gwells.roles import AQUIFERS_EDIT_ROLE
 from gwells.settings.base import get_env_variable
@@ -181,7 +182,7 @@ class ListFiles(APIView):
         return Response(documents)
 
 
-class AquiferNameList(ListAPIView):
+class AquiferNameList(AutocompleteMixin, ListAPIView):
     """ List all aquifers in a simplified format """
 
     serializer_class = serializers.AquiferSerializerBasic
@@ -195,6 +196,8 @@ class AquiferNameList(ListAPIView):
         'aquifer_id',
         'aquifer_name',
     )
+    autocomplete_fields = ('aquifer_name',)
+    autocomplete_number_fields = ('aquifer_id',)
 
     def get(self, request):
         search = self.request.query_params.get('search', None)
@@ -16,3 +16,7 @@ from django.apps import AppConfig
 
 class GWellsConfig(AppConfig):
     name = 'gwells'
+
+    def ready(self):
+        from gwells.codes import code_tables
+        code_tables.autodiscover()
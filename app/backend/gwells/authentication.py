@@ -11,22 +11,47 @@
     See the License for the specific language governing permissions and
     limitations under the License.
 """
+import hashlib
+import json
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from rest_framework import exceptions
 from rest_framework_jwt.authentication import JSONWebTokenAuthentication
 from gwells.models import Profile
 from gwells.roles import roles_to_groups
 
 
+# A single page load results in many API calls, each carrying the same token. The user, profile and
+# groups only need to be synchronized with the database when the claims in the token change, so the
+# identities that have been synchronized are kept in the cache for a short while. The user itself is
+# still loaded for every request, so that changes made in the database (e.g. deactivating the user, or
+# changing their groups) take effect straight away.
+IDENTITY_CACHE_TTL = 60 * 5
+
+
+def get_identity_cache_key(payload):
+    """
+    Returns the cache key for the identity described by a JWT payload.
+    The key is made up of the keycloak ID, and a hash of the claims we store in the database, so a
+    change to any of those claims results in a cache miss.
+    """
+    realm_access = payload.get('realm_access') or {}
+    claims = {
+        'email': payload.get('email'),
+        'name': payload.get('name') or payload.get('preferred_username'),
+        'roles': sorted(realm_access.get('roles') or []),
+    }
+    claims_hash = hashlib.sha1(json.dumps(claims, sort_keys=True).encode('utf-8')).hexdigest()
+    return 'jwt-identity:{}:{}'.format(payload.get('sub'), claims_hash)
+
+
 class JwtOidcAuthentication(JSONWebTokenAuthentication):
     """
     Authenticate users who provide a JSON Web Token in the request headers (e.g. Authorization: JWT xxxxxxxxxx)
     """
 
     def authenticate_credentials(self, payload):
-        User = get_user_model()
-
         # get keycloak ID from JWT token
         username = payload.get('sub')
 
@@ -34,6 +59,27 @@ class JwtOidcAuthentication(JSONWebTokenAuthentication):
             raise exceptions.AuthenticationFailed(
                 'JWT did not contain a "sub" attribute')
 
+        # The cache holds the id of the user synchronized with these claims.
+        cache_key = get_identity_cache_key(payload)
+        user_id = cache.get(cache_key)
+        user = None
+        if user_id is not None:
+            user = get_user_model().objects.select_related('profile').filter(pk=user_id).first()
+        if user is None:
+            user = self.sync_identity(username, payload)
+            cache.set(cache_key, user.pk, IDENTITY_CACHE_TTL)
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User account is disabled.')
+
+        return user
+
+    def sync_identity(self, username, payload):
+        """
+        Brings the user, profile and groups in the database in line with the claims in the token
+        """
+        User = get_user_model()
+
         # get or create a user with the keycloak ID
         try:
             user, user_created = User.objects.get_or_create(username=username)
@@ -64,6 +110,8 @@ class JwtOidcAuthentication(JSONWebTokenAuthentication):
             # Update the profile name if it's changed.
             profile.name = name
             profile.save()
+        # keep the profile with the (cached) user, views use it for audit fields.
+        user.profile = profile
 
         # get the roles supplied by Keycloak for this user
         try:
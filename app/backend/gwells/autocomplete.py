@@ -0,0 +1,135 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import hashlib
+from functools import reduce
+from operator import and_, or_
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.core.cache import cache
+from django.db.models import Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from rest_framework import filters
+from rest_framework.response import Response
+
+
+# Integer columns are assumed to hold (at most) 32 bit values.
+MAX_NUMBER = 2 ** 31 - 1
+
+
+def number_prefix(field, term):
+    """
+    Returns a filter matching the numbers in field that start with the digits in term, as ranges (so that
+    an index on the field can be used) rather than by comparing text.
+    e.g. 12 matches 12, 120-129, 1200-1299 and so on.
+    """
+    number = int(term)
+    query = Q(**{field: number})
+    low, high = number * 10, (number + 1) * 10
+    while 0 < low <= MAX_NUMBER:
+        query |= Q(**{'{}__gte'.format(field): low, '{}__lt'.format(field): high})
+        low, high = low * 10, high * 10
+    return query
+
+
+def greatest(expressions, output_field):
+    expressions = [Coalesce(expression, Value(0), output_field=output_field) for expression in expressions]
+    if len(expressions) == 1:
+        return expressions[0]
+    return Greatest(*expressions, output_field=output_field)
+
+
+def autocomplete(queryset, terms, fields, number_fields=(), limit=20, ordering=()):
+    """
+    Returns the top (limit) matches of the search terms in queryset.
+
+    Every term has to be found in one of the (text) fields, or be the start of one of the number fields.
+    The text fields are matched with ILIKE, which is served by their trigram indexes. As a fallback, for
+    misspelled single word searches, a record is also matched if a field is similar to the search.
+
+    Exact numbers come first, then records where a field starts with the first term, then the records
+    most similar to the search.
+    """
+    search = ' '.join(terms)
+
+    matches = []
+    for term in terms:
+        term_matches = [Q(**{'{}__icontains'.format(field): term}) for field in fields]
+        if term.isdigit():
+            term_matches += [number_prefix(field, term) for field in number_fields]
+        if term_matches:
+            matches.append(reduce(or_, term_matches))
+    if not matches:
+        return queryset.none()
+    query = reduce(and_, matches)
+    if fields and len(terms) == 1:
+        query |= reduce(or_, (Q(**{'{}__trigram_similar'.format(field): search}) for field in fields))
+
+    first = terms[0]
+    prefixes = [Case(When(**{'{}__istartswith'.format(field): first}, then=Value(1)), default=Value(0),
+                     output_field=IntegerField())
+                for field in fields]
+    if first.isdigit():
+        prefixes += [Case(When(**{field: int(first)}, then=Value(2)), default=Value(0),
+                          output_field=IntegerField())
+                     for field in number_fields]
+    queryset = queryset.filter(query).annotate(
+        autocomplete_prefix=greatest(prefixes, IntegerField()))
+    order_by = ['-autocomplete_prefix']
+    if fields:
+        queryset = queryset.annotate(autocomplete_similarity=greatest(
+            [TrigramSimilarity(field, search) for field in fields], FloatField()))
+        order_by.append('-autocomplete_similarity')
+    return queryset.order_by(*order_by, *ordering)[:limit]
+
+
+class AutocompleteMixin():
+    """
+    Serves the searches of autocomplete widgets (?search=) from trigram-indexed name columns, returning the
+    best (autocomplete_limit) matches. The responses are cached for a short time, as the same searches are
+    made over and over while typing. Without a search, the view lists as usual.
+    Usage:
+        class AquiferNameList(AutocompleteMixin, ListAPIView):
+            autocomplete_fields = ('aquifer_name',)
+            autocomplete_number_fields = ('aquifer_id',)
+    """
+
+    autocomplete_fields = ()
+    autocomplete_number_fields = ()
+    autocomplete_limit = 20
+    autocomplete_timeout = 60
+
+    def get_autocomplete_terms(self):
+        return filters.SearchFilter().get_search_terms(self.request)
+
+    def filter_queryset(self, queryset):
+        terms = self.get_autocomplete_terms()
+        if not terms:
+            return super().filter_queryset(queryset)
+        # The search terms are matched by autocomplete rather than the search filter.
+        for backend in self.filter_backends:
+            if not issubclass(backend, filters.SearchFilter):
+                queryset = backend().filter_queryset(self.request, queryset, self)
+        ordering = getattr(self, 'ordering', None) or queryset.model._meta.ordering or ('pk',)
+        return autocomplete(queryset, terms, self.autocomplete_fields, self.autocomplete_number_fields,
+                            self.autocomplete_limit, ordering)
+
+    def list(self, request, *args, **kwargs):
+        if not self.get_autocomplete_terms():
+            return super().list(request, *args, **kwargs)
+        key = 'autocomplete:{}'.format(hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest())
+        data = cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, self.autocomplete_timeout)
+        return Response(data)
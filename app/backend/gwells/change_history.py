@@ -26,14 +26,14 @@ def get_fk_description(obj, field, value):
     value: the value of the foreign key field (an id for a related model instance)
     """
 
-    related_object = None
-
-    try:
-        related_object = obj.revision.version_set.get(object_id=value)
-    except:
+    # The versions are matched in memory, so that a revision's version_set can be prefetched for a
+    # whole history (see registries.views.PersonHistory)
+    matches = [version for version in obj.revision.version_set.all() if version.object_id == str(value)]
+    if len(matches) != 1:
         # unable to find related object matching foreign key
         # this can occur if related record wasn't logged along with the edited record
         return value
+    related_object = matches[0]
 
     # return the 'description' or 'name' field, if available
     return related_object.field_dict.get('description') or related_object.field_dict.get('name') or value
@@ -1,7 +1,18 @@
 import os
 import json
+import logging
+from collections import Counter
 from io import open
 
+from django.apps import apps as django_apps
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from gwells.versions import SharedVersion
+
+
+logger = logging.getLogger(__name__)
+
 
 class CodeFixture():
     """Loads JSON code table fixtures into database using migrations.
@@ -42,3 +53,104 @@ class CodeFixture():
 
     def __init__(self, fixture_path):
         self.fixture = self._process_fixture_file(fixture_path)
+
+
+class CodeTableCache():
+    """Keeps code tables in memory, so that code lookups and foreign key validation don't query the
+    database.
+    Each registered table is loaded the first time it's used. Saving or deleting a code bumps a version
+    kept in the database (see gwells.versions.SharedVersion), which discards the tables held by every
+    process: straight away in the process that made the change, and within VERSION_INTERVAL seconds in
+    the others.
+    Usage:
+        from gwells.codes import code_tables
+        code_tables.register(WellYieldUnitCode)
+        code_tables.get(WellYieldUnitCode, 'USGPM')
+
+    Codes returned are shared, and must not be modified.
+    """
+
+    VERSION_NAME = 'code-tables'
+    VERSION_INTERVAL = 30
+
+    def __init__(self):
+        self._models = set()
+        self._tables = {}
+        self._version = None
+        self._shared_version = SharedVersion(self.VERSION_NAME, self.VERSION_INTERVAL)
+        self.hits = Counter()
+        self.loads = Counter()
+
+    def register(self, *models):
+        for model in models:
+            if model in self._models:
+                continue
+            self._models.add(model)
+            label = model._meta.label
+            post_save.connect(self.invalidate, sender=model, dispatch_uid='code-tables-save-{}'.format(label))
+            post_delete.connect(self.invalidate, sender=model,
+                                dispatch_uid='code-tables-delete-{}'.format(label))
+
+    def autodiscover(self):
+        """Register every audited model named *Code"""
+        from gwells.models import AuditModel
+        self.register(*(model for model in django_apps.get_models()
+                        if model.__name__.endswith('Code') and issubclass(model, AuditModel)))
+
+    def is_registered(self, model):
+        return model in self._models
+
+    def version(self):
+        """The version of the code tables, shared by every process"""
+        return self._shared_version.version()
+
+    def update_date(self):
+        """When a code table was last changed (or when the version was first used)"""
+        return self._shared_version.update_date()
+
+    def _forget(self):
+        self._tables = {}
+        self._shared_version.expire()
+
+    def invalidate(self, **kwargs):
+        """Signal receiver, discards the code tables held by every process"""
+        self._shared_version.bump()
+        self._tables = {}
+        # Codes loaded (by other connections) before the change is committed are out of date too.
+        transaction.on_commit(self._forget)
+
+    def _table(self, model):
+        if model not in self._models:
+            raise ValueError('{} is not a registered code table'.format(model._meta.label))
+        version = self.version()
+        if version != self._version:
+            self._tables = {}
+            self._version = version
+        label = model._meta.label
+        table = self._tables.get(model)
+        if table is None:
+            table = self._tables[model] = {code.pk: code for code in model._default_manager.all()}
+            self.loads[label] += 1
+            logger.debug('loaded code table {} ({} codes)'.format(label, len(table)))
+        else:
+            self.hits[label] += 1
+        return table
+
+    def get(self, model, pk):
+        """Return the code with the given primary key, raising model.DoesNotExist if there isn't one"""
+        try:
+            return self._table(model)[model._meta.pk.to_python(pk)]
+        except KeyError:
+            raise model.DoesNotExist('{} matching pk={} does not exist.'.format(model._meta.object_name, pk))
+
+    def all(self, model):
+        """Return all the codes in a table, in the table's default order"""
+        return list(self._table(model).values())
+
+    def stats(self):
+        """Hits and loads for each code table"""
+        return {label: {'hits': self.hits[label], 'loads': self.loads[label]}
+                for label in sorted(set(self.hits) | set(self.loads))}
+
+
+code_tables = CodeTableCache()
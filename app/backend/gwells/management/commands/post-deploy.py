@@ -7,3 +7,4 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         management.call_command('createadminuser', verbosity=0)
+        management.call_command('refresh_registry_search', verbosity=0)
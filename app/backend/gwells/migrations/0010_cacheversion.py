@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gwells', '0009_auto_20181116_2316'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=1)),
+                ('update_date', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'cache_version',
+            },
+        ),
+    ]
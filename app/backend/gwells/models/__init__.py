@@ -66,3 +66,17 @@ def create_user_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     instance.profile.save()
+
+
+class CacheVersion(models.Model):
+    """
+    A version number shared by every process. Data cached in a process (the Django cache is local to each
+    process) is kept for a version, and discarded everywhere when the version is bumped.
+    See gwells.versions.SharedVersion
+    """
+    name = models.CharField(primary_key=True, max_length=100)
+    version = models.BigIntegerField(default=1)
+    update_date = models.DateTimeField()
+
+    class Meta:
+        db_table = 'cache_version'
@@ -1,5 +1,5 @@
 from collections import OrderedDict
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
 from rest_framework.response import Response
 
 
@@ -18,3 +18,14 @@ class APILimitOffsetPagination(LimitOffsetPagination):
             ('offset', self.offset),
             ('results', data)
         ]))
+
+
+class APIKeysetPagination(CursorPagination):
+    """
+    Provides cursor (keyset) pagination, ordered by a unique, indexed key. Pages are fetched with a
+    WHERE key > last key clause, so fetching a page doesn't get slower further into the results.
+    """
+
+    page_size = 30
+    page_size_query_param = 'limit'
+    max_page_size = 100
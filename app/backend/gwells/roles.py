@@ -15,6 +15,8 @@ from typing import Tuple
 import logging
 
 from django.contrib.auth.models import Group, Permission
+from django.db import IntegrityError, transaction
+from rest_framework import exceptions
 
 
 logger = logging.getLogger(__name__)
@@ -63,21 +65,42 @@ def roles_to_groups(user, roles: Tuple[str] = None):
         raise exceptions.AuthenticationFailed(
             'Failed to retrieve user to apply roles to')
 
-    user_group_names = [group.name for group in user.groups.all()]
+    roles = roles or ()
+    UserGroup = user.groups.through
 
-    for role in roles:
-        # if user is not in their role group, add them
-        if role not in user_group_names and role not in EXCLUDE:
-            group = Group.objects.filter(name=role).first()
-            if not group:
-                # From time to time, a new role will be added to keycloak, and this role will not yet
-                # exist in the django database as a group. When this happens, we create it.
-                logger.info('Group "{}" does not exist. Creating it....'.format(role))
-                group = Group(name=role)
-                group.save()
-            group.user_set.add(user)
+    user_groups = dict(user.groups.values_list('name', 'id'))
+
+    # if user is not in their role group, add them
+    missing = {role for role in roles if role not in user_groups and role not in EXCLUDE}
+    if missing:
+        group_ids = get_group_ids(missing)
+        UserGroup.objects.bulk_create(
+            [UserGroup(user_id=user.pk, group_id=group_id) for group_id in group_ids.values()])
 
     # check if user has been removed from their SSO (Keycloak) group
-    for group in user_group_names:
-        if group not in roles:
-            user.groups.get(name=group).user_set.remove(user)
+    stale = [group_id for name, group_id in user_groups.items() if name not in roles]
+    if stale:
+        UserGroup.objects.filter(user_id=user.pk, group_id__in=stale).delete()
+
+
+def get_group_ids(names):
+    """
+    Returns a dict of group name to group id for the given names, creating groups that don't exist yet.
+    The ids are looked up every time (in one query), rather than kept for the lifetime of the process, as
+    groups may be deleted or recreated by another process.
+    """
+    group_ids = dict(Group.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = set(names) - group_ids.keys()
+    if missing:
+        # From time to time, a new role will be added to keycloak, and this role will not yet
+        # exist in the django database as a group. When this happens, we create it.
+        logger.info('Groups "{}" do not exist. Creating them....'.format('", "'.join(sorted(missing))))
+        try:
+            with transaction.atomic():
+                created = Group.objects.bulk_create([Group(name=name) for name in missing])
+            group_ids.update({group.name: group.id for group in created})
+        except IntegrityError:
+            # Another request created the group in the meantime.
+            for name in missing:
+                group_ids[name] = Group.objects.get_or_create(name=name)[0].id
+    return group_ids
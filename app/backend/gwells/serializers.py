@@ -1,4 +1,6 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
+from gwells.codes import code_tables
 from gwells.models import Survey, ProvinceStateCode
 
 
@@ -26,6 +28,25 @@ class AuditModelSerializer(serializers.ModelSerializer):
     update_date = serializers.ReadOnlyField()
 
 
+class CodeTableRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key related field that validates codes against the in memory code tables, falling back on
+    the database for models that aren't code tables.
+    Can be used as the serializer_related_field of a ModelSerializer.
+    """
+
+    def to_internal_value(self, data):
+        model = self.get_queryset().model
+        if not code_tables.is_registered(model):
+            return super().to_internal_value(data)
+        try:
+            return code_tables.get(model, data)
+        except model.DoesNotExist:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
 class ProvinceStateCodeSerializer(serializers.ModelSerializer):
     """
     Serializes ProvinceStateCodes
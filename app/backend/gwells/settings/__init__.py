@@ -57,6 +57,11 @@ ENABLE_GOOGLE_ANALYTICS = get_env_variable(
 ENABLE_ADDITIONAL_DOCUMENTS = get_env_variable(
     'ENABLE_ADDITIONAL_DOCUMENTS', 'False', strict=True) == 'True'
 
+# When enabled, submissions are stacked onto wells by a worker (python manage.py stackworker) instead
+# of during the submission request.
+ENABLE_ASYNC_STACKING = get_env_variable(
+    'ENABLE_ASYNC_STACKING', 'False') == 'True'
+
 # Controls app context
 APP_CONTEXT_ROOT = get_env_variable('APP_CONTEXT_ROOT', 'gwells')
 
@@ -1,6 +1,8 @@
+from django.core.cache import cache
 from django.core.management import call_command
 from django.test import TestCase
 from django.utils.six import StringIO
+from rest_framework.exceptions import AuthenticationFailed
 from gwells.roles import (
     roles_to_groups,
     ADMIN_ROLE,
@@ -8,8 +10,11 @@ from gwells.roles import (
     REGISTRIES_ADJUDICATOR_ROLE,
     REGISTRIES_VIEWER_ROLE,
 )
-from django.contrib.auth.models import User
-from gwells.models import Profile
+from django.contrib.auth.models import Group, User
+from gwells.codes import code_tables, CodeTableCache
+from gwells.models import Profile, ProvinceStateCode
+from gwells.authentication import JwtOidcAuthentication
+from gwells.versions import SharedVersion
 
 
 class GwellsRoleGroupsTests(TestCase):
@@ -65,3 +70,122 @@ class GwellsRoleGroupsTests(TestCase):
             name=REGISTRIES_ADJUDICATOR_ROLE).exists(), True)
         self.assertEquals(self.test_user.groups.filter(
             name=REGISTRIES_VIEWER_ROLE).exists(), True)
+
+    def test_excluded_roles_not_added(self):
+        roles_to_groups(self.test_user, [ADMIN_ROLE, 'offline_access'])
+
+        self.assertEquals(self.test_user.groups.filter(
+            name=ADMIN_ROLE).exists(), True)
+        self.assertEquals(self.test_user.groups.filter(
+            name='offline_access').exists(), False)
+
+    def test_unchanged_roles_single_query(self):
+        """ Test that re-applying the same roles only reads the user's groups """
+        roles = [ADMIN_ROLE, REGISTRIES_VIEWER_ROLE]
+        roles_to_groups(self.test_user, roles)
+
+        with self.assertNumQueries(1):
+            roles_to_groups(self.test_user, roles)
+
+    def test_deleted_group_recreated(self):
+        """ Test that a group deleted (e.g. by another process) is created again """
+        roles_to_groups(self.test_user, [ADMIN_ROLE])
+        Group.objects.filter(name=ADMIN_ROLE).delete()
+        self.test_user.refresh_from_db()
+
+        roles_to_groups(self.test_user, [ADMIN_ROLE])
+        self.assertEquals(self.test_user.groups.filter(
+            name=ADMIN_ROLE).exists(), True)
+
+
+class JwtOidcAuthenticationTests(TestCase):
+    """
+    Tests caching of identities authenticated with a JWT
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.payload = {
+            'sub': 'a-keycloak-id',
+            'email': 'example@example.com',
+            'name': 'Test User',
+            'realm_access': {'roles': [ADMIN_ROLE, REGISTRIES_VIEWER_ROLE]}
+        }
+
+    def test_identity_synchronized(self):
+        user = JwtOidcAuthentication().authenticate_credentials(self.payload)
+
+        self.assertEqual(user.username, 'a-keycloak-id')
+        self.assertEqual(user.email, 'example@example.com')
+        self.assertEqual(Profile.objects.get(user=user).name, 'Test User')
+        self.assertTrue(user.groups.filter(name=ADMIN_ROLE).exists())
+
+    def test_repeat_authentication_only_loads_user(self):
+        authentication = JwtOidcAuthentication()
+        authentication.authenticate_credentials(self.payload)
+
+        # The user and profile are loaded, nothing is synchronized.
+        with self.assertNumQueries(1):
+            user = authentication.authenticate_credentials(self.payload)
+        self.assertEqual(user.username, 'a-keycloak-id')
+        self.assertEqual(user.profile.name, 'Test User')
+
+    def test_deactivated_user_rejected(self):
+        authentication = JwtOidcAuthentication()
+        authentication.authenticate_credentials(self.payload)
+
+        User.objects.filter(username='a-keycloak-id').update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            authentication.authenticate_credentials(self.payload)
+
+    def test_changed_claims_are_synchronized(self):
+        authentication = JwtOidcAuthentication()
+        authentication.authenticate_credentials(self.payload)
+
+        self.payload['email'] = 'changed@example.com'
+        self.payload['realm_access'] = {'roles': [REGISTRIES_VIEWER_ROLE]}
+        user = authentication.authenticate_credentials(self.payload)
+
+        self.assertEqual(User.objects.get(username='a-keycloak-id').email, 'changed@example.com')
+        self.assertFalse(user.groups.filter(name=ADMIN_ROLE).exists())
+        self.assertTrue(user.groups.filter(name=REGISTRIES_VIEWER_ROLE).exists())
+
+
+class CodeTableCacheTests(TestCase):
+    """
+    Tests the in memory code tables
+    """
+
+    def setUp(self):
+        ProvinceStateCode.objects.get_or_create(
+            province_state_code='BC', defaults={'description': 'British Columbia', 'display_order': 1})
+        code_tables.invalidate()
+
+    def test_table_loaded_once(self):
+        label = ProvinceStateCode._meta.label
+        code_tables.version()
+        with self.assertNumQueries(1):
+            code_tables.get(ProvinceStateCode, 'BC')
+        hits = code_tables.hits[label]
+        with self.assertNumQueries(0):
+            self.assertEqual(code_tables.get(ProvinceStateCode, 'BC').description, 'British Columbia')
+        self.assertEqual(code_tables.stats()[label]['hits'], hits + 1)
+
+    def test_missing_code(self):
+        with self.assertRaises(ProvinceStateCode.DoesNotExist):
+            code_tables.get(ProvinceStateCode, 'XX')
+
+    def test_save_invalidates(self):
+        code_tables.get(ProvinceStateCode, 'BC')
+        ProvinceStateCode.objects.create(province_state_code='XX', description='Test', display_order=99)
+        self.assertEqual(code_tables.get(ProvinceStateCode, 'XX').description, 'Test')
+
+    def test_version_shared_between_processes(self):
+        # Another process keeps using the version it read, until it checks the version again.
+        other = SharedVersion(CodeTableCache.VERSION_NAME)
+        version = other.version()
+        ProvinceStateCode.objects.create(province_state_code='XX', description='Test', display_order=99)
+        self.assertEqual(other.version(), version)
+        other.expire()
+        self.assertNotEqual(other.version(), version)
+        self.assertEqual(other.version(), code_tables.version())
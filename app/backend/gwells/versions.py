@@ -0,0 +1,70 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import time
+
+from django.db.models import F
+from django.utils import timezone
+
+from gwells.models import CacheVersion
+
+
+class SharedVersion():
+    """A version number kept in the database, so that it's the same in every process (unlike the Django
+    cache, which is local to each process). Data cached for a version is discarded everywhere once the
+    version is bumped.
+    Each process reads the version at most every interval seconds, so data cached in other processes
+    is discarded within that time of a change. The process that bumps the version sees the change
+    straight away.
+    Usage:
+        cities_version = SharedVersion('registry-cities')
+        key = 'registry-cities:{}'.format(cities_version.version())
+        # ...and when the data changes:
+        cities_version.bump()
+    """
+
+    def __init__(self, name, interval=30):
+        self.name = name
+        self.interval = interval
+        self._current = None
+        self._checked = None
+
+    def _get(self):
+        now = time.monotonic()
+        if self._checked is None or now - self._checked >= self.interval:
+            current = CacheVersion.objects.filter(name=self.name).values_list('version', 'update_date').first()
+            if current is None:
+                entry, created = CacheVersion.objects.get_or_create(
+                    name=self.name, defaults={'update_date': timezone.now()})
+                current = (entry.version, entry.update_date)
+            self._current = current
+            self._checked = now
+        return self._current
+
+    def version(self):
+        return self._get()[0]
+
+    def update_date(self):
+        """When the version was last bumped"""
+        return self._get()[1]
+
+    def bump(self):
+        """Change the version. Other processes see the change once the transaction is committed"""
+        now = timezone.now()
+        if not CacheVersion.objects.filter(name=self.name).update(version=F('version') + 1, update_date=now):
+            CacheVersion.objects.get_or_create(name=self.name, defaults={'update_date': now})
+        self.expire()
+
+    def expire(self):
+        """Read the version from the database the next time it's used"""
+        self._checked = None
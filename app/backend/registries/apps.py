@@ -16,3 +16,10 @@ from django.apps import AppConfig
 
 class RegistriesConfig(AppConfig):
     name = 'registries'
+
+    def ready(self):
+        # Connects the signals that maintain the registry search entries.
+        import registries.search  # noqa
+        from gwells.codes import code_tables
+        from registries.codes import PERSON_OPTIONS_CODE_TABLES
+        code_tables.register(*PERSON_OPTIONS_CODE_TABLES)
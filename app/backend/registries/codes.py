@@ -0,0 +1,39 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+from gwells.models import ProvinceStateCode
+from registries.models import (
+    AccreditedCertificateCode,
+    ActivityCode,
+    ApplicationStatusCode,
+    CertifyingAuthorityCode,
+    ProofOfAgeCode,
+    Qualification,
+    RegistriesRemovalReason,
+    SubactivityCode,
+    WellClassCode)
+
+
+# The code tables the person options are built from. The options are rebuilt when any of them change.
+PERSON_OPTIONS_CODE_TABLES = (
+    ActivityCode,
+    SubactivityCode,
+    Qualification,
+    WellClassCode,
+    AccreditedCertificateCode,
+    CertifyingAuthorityCode,
+    ProofOfAgeCode,
+    ApplicationStatusCode,
+    RegistriesRemovalReason,
+    ProvinceStateCode,
+)
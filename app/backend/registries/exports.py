@@ -0,0 +1,24 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+from gwells.settings.base import get_env_variable
+
+
+# The registries extracts (see the export_registries command) are kept in the well export bucket (unless
+# they're given a bucket of their own), under this prefix.
+EXPORT_PREFIX = 'registries/'
+
+
+def export_bucket():
+    """ The bucket the registries extracts are uploaded to """
+    return get_env_variable('S3_REGISTRIES_EXPORT_BUCKET', get_env_variable('S3_WELL_EXPORT_BUCKET'))
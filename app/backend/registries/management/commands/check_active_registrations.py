@@ -0,0 +1,50 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import logging
+
+from django.core.management.base import BaseCommand
+
+from registries.search import find_drift, refresh_people
+
+# Run from command line :
+# python manage.py check_active_registrations
+# python manage.py check_active_registrations --repair
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Checks that the is_active flags of people and registrations match their applications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true',
+                            help='Refresh the people whose flags have drifted')
+
+    def handle(self, *args, **options):
+        registrations, people = find_drift()
+        person_guids = set(registrations.values_list('person', flat=True))
+        person_guids.update(people.values_list('person_guid', flat=True))
+
+        if not person_guids:
+            self.stdout.write(self.style.SUCCESS('active flags are consistent'))
+            return
+
+        self.stdout.write(self.style.WARNING('active flags have drifted for {} people'.format(
+            len(person_guids))))
+        for person_guid in sorted(person_guids, key=str):
+            logger.warning('active flags have drifted for person {}'.format(person_guid))
+
+        if options['repair']:
+            refresh_people(person_guids)
+            self.stdout.write(self.style.SUCCESS('repaired {} people'.format(len(person_guids))))
@@ -0,0 +1,207 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import csv
+import logging
+import os
+import string
+import zipfile
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from minio import Minio
+from openpyxl import Workbook
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.write_only import WriteOnlyCell
+
+from gwells.settings.base import get_env_variable
+from registries.exports import EXPORT_PREFIX, export_bucket
+
+# Run from command line :
+# python manage.py export_registries
+
+logger = logging.getLogger(__name__)
+
+# Only active registrations (see Register.is_active), of people that haven't been removed, are exported.
+REGISTRANT_SQL = """select registries_register.registration_no,
+ registries_register.registries_activity_code,
+ registries_activity_code.description as activity,
+ registries_person.first_name, registries_person.surname,
+ registries_person.contact_tel, registries_person.contact_cell, registries_person.contact_email,
+ registries_organization.name as organization_name,
+ registries_organization.street_address, registries_organization.city,
+ registries_organization.province_state_code, registries_organization.postal_code,
+ registries_organization.main_tel, registries_organization.email as organization_email,
+ registries_organization.website_url
+ from registries_register
+ inner join registries_person on registries_person.person_guid = registries_register.person_guid
+ inner join registries_activity_code on
+ registries_activity_code.registries_activity_code = registries_register.registries_activity_code
+ left join registries_organization on
+ registries_organization.org_guid = registries_register.organization_guid
+ where registries_register.is_active and registries_person.expired_date is null
+ order by registries_register.registries_activity_code, registries_person.surname,
+ registries_person.first_name, registries_register.registration_no"""
+
+QUALIFICATION_SQL = """select registries_register.registration_no,
+ registries_register.registries_activity_code,
+ registries_subactivity_code.description as subactivity,
+ (select string_agg(registries_well_qualification.registries_well_class_code, ', '
+   order by registries_well_qualification.display_order)
+  from registries_well_qualification
+  where registries_well_qualification.registries_subactivity_code =
+   registries_application.registries_subactivity_code) as well_classes,
+ registries_accredited_certificate_code.name as certificate,
+ registries_accredited_certificate_code.cert_auth_code as certifying_authority,
+ registries_application.application_outcome_date
+ from registries_application
+ inner join registries_register on
+ registries_register.register_guid = registries_application.register_guid
+ inner join registries_person on registries_person.person_guid = registries_register.person_guid
+ inner join registries_subactivity_code on
+ registries_subactivity_code.registries_subactivity_code = registries_application.registries_subactivity_code
+ left join registries_accredited_certificate_code on
+ registries_accredited_certificate_code.acc_cert_guid = registries_application.acc_cert_guid
+ where registries_register.is_active and registries_person.expired_date is null
+ and registries_application.registries_application_status_code = 'A'
+ and registries_application.removal_date is null
+ order by registries_register.registries_activity_code, registries_register.registration_no,
+ registries_subactivity_code.display_order"""
+
+ORGANIZATION_SQL = """select registries_organization.name, registries_organization.street_address,
+ registries_organization.city, registries_organization.province_state_code,
+ registries_organization.postal_code, registries_organization.main_tel, registries_organization.fax_tel,
+ registries_organization.email, registries_organization.website_url,
+ count(*) as active_registrations
+ from registries_organization
+ inner join registries_register on registries_register.organization_guid = registries_organization.org_guid
+ inner join registries_person on registries_person.person_guid = registries_register.person_guid
+ where registries_register.is_active and registries_person.expired_date is null
+ and registries_organization.expired_date is null
+ group by registries_organization.org_guid
+ order by registries_organization.name"""
+
+
+def clean(value):
+    """ Returns a value that is safe to write to CSV and XLSX """
+    if type(value) is str:
+        # There are non-printable characters in the source data that can cause issues in the export.
+        value = ''.join([s for s in value if s in string.printable])
+        # We can't have something starting with an = sign, it would be interpreted as a formula in excel.
+        if value.startswith('='):
+            value = '\'{}'.format(value)
+    return value
+
+
+class Command(BaseCommand):
+    help = 'Exports the active registrants, their qualifications and organizations to CSV and XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Number of rows fetched from the database at a time')
+        parser.add_argument('--no-upload', action='store_true',
+                            help='Keep the files, instead of uploading them to object storage')
+
+    def handle(self, *args, **options):
+        logger.info('starting registries export')
+        zip_filename = 'registries.zip'
+        spreadsheet_filename = 'registries.xlsx'
+        self.generate_files(zip_filename, spreadsheet_filename, options['chunk_size'])
+        if options['no_upload']:
+            self.stdout.write(self.style.SUCCESS('registries export written to {} and {}'.format(
+                zip_filename, spreadsheet_filename)))
+            return
+        self.upload_files(zip_filename, spreadsheet_filename)
+        logger.info('cleaning up')
+        for filename in (zip_filename, spreadsheet_filename):
+            if os.path.exists(filename):
+                os.remove(filename)
+        logger.info('registries export complete')
+        self.stdout.write(self.style.SUCCESS('registries export complete'))
+
+    def upload_files(self, zip_filename, spreadsheet_filename):
+        minioClient = Minio(get_env_variable('S3_HOST'),
+                            access_key=get_env_variable('S3_PUBLIC_ACCESS_KEY'),
+                            secret_key=get_env_variable('S3_PUBLIC_SECRET_KEY'),
+                            secure=True)
+        for filename in (zip_filename, spreadsheet_filename):
+            logger.info('uploading {}'.format(filename))
+            with open(filename, 'rb') as file_data:
+                file_stat = os.stat(filename)
+                minioClient.put_object(export_bucket(),
+                                       EXPORT_PREFIX + filename,
+                                       file_data,
+                                       file_stat.st_size)
+
+    def export(self, workbook, registries_zip, worksheet_name, cursor, chunk_size):
+        logger.info('exporting {}'.format(worksheet_name))
+        worksheet = workbook.create_sheet(worksheet_name)
+        csv_file = '{}.csv'.format(worksheet_name)
+        if os.path.exists(csv_file):
+            os.remove(csv_file)
+        with open(csv_file, 'w') as csvfile:
+            csvwriter = csv.writer(csvfile, dialect='excel')
+
+            # The description of a server side cursor is only available once rows have been fetched.
+            rows = cursor.fetchmany(chunk_size)
+            headings = [field[0] if isinstance(field, tuple) else field.name for field in cursor.description]
+            cells = []
+            for index, heading in enumerate(headings):
+                worksheet.column_dimensions[get_column_letter(index + 1)].width = len(heading) + 2
+                cell = WriteOnlyCell(worksheet, value=heading)
+                cell.font = Font(bold=True)
+                cells.append(cell)
+            worksheet.append(cells)
+            csvwriter.writerow(headings)
+
+            # Rows are written as they're fetched, so only one chunk is held in memory.
+            count = 0
+            while rows:
+                for record in rows:
+                    values = [clean(value) for value in record]
+                    csvwriter.writerow(values)
+                    worksheet.append(values)
+                count += len(rows)
+                rows = cursor.fetchmany(chunk_size)
+
+            worksheet.auto_filter.ref = 'A1:{}{}'.format(get_column_letter(len(headings)), count + 1)
+
+        registries_zip.write(csv_file)
+        if os.path.exists(csv_file):
+            os.remove(csv_file)
+        logger.info('exported {} {} rows'.format(count, worksheet_name))
+
+    def generate_files(self, zip_filename, spreadsheet_filename, chunk_size):
+        sheets = {
+            'registrant': REGISTRANT_SQL,
+            'qualification': QUALIFICATION_SQL,
+            'organization': ORGANIZATION_SQL,
+        }
+
+        if os.path.exists(zip_filename):
+            os.remove(zip_filename)
+        with zipfile.ZipFile(zip_filename, 'w', compression=zipfile.ZIP_DEFLATED) as registries_zip:
+            if os.path.exists(spreadsheet_filename):
+                os.remove(spreadsheet_filename)
+            workbook = Workbook(write_only=True)
+
+            for sheet, sql in sheets.items():
+                logger.info('creating {} cursor'.format(sheet))
+                # A chunked cursor is a server side cursor on PostgreSQL, which has to be used in a
+                # transaction.
+                with transaction.atomic(), connection.chunked_cursor() as cursor:
+                    cursor.execute(sql)
+                    self.export(workbook, registries_zip, sheet, cursor, chunk_size)
+            workbook.save(filename=spreadsheet_filename)
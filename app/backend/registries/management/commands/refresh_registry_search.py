@@ -0,0 +1,31 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import logging
+
+from django.core.management.base import BaseCommand
+
+from registries.search import refresh_all
+
+# Run from command line :
+# python manage.py refresh_registry_search
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the registry search entries for every person'
+
+    def handle(self, *args, **options):
+        count = refresh_all()
+        self.stdout.write(self.style.SUCCESS('refreshed registry search for {} people'.format(count)))
@@ -0,0 +1,45 @@
+# Generated by Django 2.1.7 on 2019-02-26 19:03
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registries', '0013_auto_20180712_2107'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='RegistrySearch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('registration_no', models.CharField(blank=True, max_length=15, null=True)),
+                ('organization_name', models.CharField(blank=True, max_length=200, null=True)),
+                ('city', models.CharField(blank=True, max_length=50, null=True)),
+                ('is_active', models.BooleanField(default=False)),
+                ('search_text', models.TextField()),
+                ('organization', models.ForeignKey(blank=True, db_column='organization_guid', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='registries.Organization')),
+                ('person', models.ForeignKey(db_column='person_guid', on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='registries.Person')),
+                ('registries_activity', models.ForeignKey(db_column='registries_activity_code', on_delete=django.db.models.deletion.CASCADE, to='registries.ActivityCode')),
+            ],
+            options={
+                'db_table': 'registries_search',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='registrysearch',
+            unique_together={('person', 'registries_activity')},
+        ),
+        migrations.AddIndex(
+            model_name='registrysearch',
+            index=models.Index(fields=['registries_activity', 'is_active', 'city'], name='registries_search_active'),
+        ),
+        # Django 2.1 can't declare an index with an operator class, so the trigram index is created here.
+        migrations.RunSQL(
+            'CREATE INDEX registries_search_text_trgm ON registries_search USING gin (search_text gin_trgm_ops)',
+            'DROP INDEX registries_search_text_trgm'),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 2.1.7 on 2019-02-27 17:42
+
+from django.db import migrations, models
+
+
+# An active registration has an approved application that hasn't been removed, and an active person has
+# an active registration.
+UPDATE_REGISTRATIONS = """
+UPDATE registries_register SET is_active = EXISTS (
+    SELECT 1 FROM registries_application
+    WHERE registries_application.register_guid = registries_register.register_guid
+    AND registries_application.registries_application_status_code = 'A'
+    AND registries_application.removal_date IS NULL)
+"""
+
+UPDATE_PEOPLE = """
+UPDATE registries_person SET is_active = EXISTS (
+    SELECT 1 FROM registries_register
+    WHERE registries_register.person_guid = registries_person.person_guid
+    AND registries_register.is_active)
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registries', '0014_registrysearch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='is_active',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='register',
+            name='is_active',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='register',
+            index=models.Index(fields=['registries_activity', 'is_active'], name='registries_register_active'),
+        ),
+        migrations.RunSQL(UPDATE_REGISTRATIONS, migrations.RunSQL.noop),
+        migrations.RunSQL(UPDATE_PEOPLE, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.1.7 on 2019-02-28 16:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+POPULATE_CITIES = """
+INSERT INTO registries_city (
+    registries_activity_code, city, province_state_code, registration_count, active_count)
+SELECT registries_register.registries_activity_code, registries_organization.city,
+    MIN(registries_organization.province_state_code), COUNT(*),
+    COUNT(*) FILTER (WHERE registries_register.is_active)
+FROM registries_register
+JOIN registries_organization
+    ON registries_organization.org_guid = registries_register.organization_guid
+WHERE registries_organization.city IS NOT NULL AND registries_organization.city <> ''
+GROUP BY registries_register.registries_activity_code, registries_organization.city
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gwells', '0001_initial'),
+        ('registries', '0015_active_registrations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistryCity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=50)),
+                ('registration_count', models.PositiveIntegerField(default=0)),
+                ('active_count', models.PositiveIntegerField(default=0)),
+                ('province_state', models.ForeignKey(blank=True, db_column='province_state_code', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='gwells.ProvinceStateCode')),
+                ('registries_activity', models.ForeignKey(db_column='registries_activity_code', on_delete=django.db.models.deletion.CASCADE, to='registries.ActivityCode')),
+            ],
+            options={
+                'db_table': 'registries_city',
+                'ordering': ['city'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='registrycity',
+            unique_together={('registries_activity', 'city')},
+        ),
+        migrations.RunSQL(POPULATE_CITIES, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.1.7 on 2019-03-01 18:20
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registries', '0016_registrycity'),
+    ]
+
+    # Trigram indexes for the name autocomplete (see gwells.autocomplete). Django 2.1 can't declare an
+    # index with an operator class, so they're created here.
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(
+            'CREATE INDEX registries_person_surname_trgm ON registries_person '
+            'USING gin (surname gin_trgm_ops)',
+            'DROP INDEX registries_person_surname_trgm'),
+        migrations.RunSQL(
+            'CREATE INDEX registries_person_first_name_trgm ON registries_person '
+            'USING gin (first_name gin_trgm_ops)',
+            'DROP INDEX registries_person_first_name_trgm'),
+        migrations.RunSQL(
+            'CREATE INDEX registries_organization_name_trgm ON registries_organization '
+            'USING gin (name gin_trgm_ops)',
+            'DROP INDEX registries_organization_name_trgm'),
+    ]
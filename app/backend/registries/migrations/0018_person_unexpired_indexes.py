@@ -0,0 +1,24 @@
+# Generated by Django 2.1.7 on 2019-03-04 17:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registries', '0017_name_trigram_indexes'),
+    ]
+
+    # Partial indexes of the people that haven't expired (see Person.unexpired), in the orders they're
+    # listed in: by surname in the person list, and by first name and surname by default. Django 2.1 can't
+    # declare a partial index, so they're created here.
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX registries_person_unexpired_surname ON registries_person (surname, first_name) '
+            'WHERE expired_date IS NULL',
+            'DROP INDEX registries_person_unexpired_surname'),
+        migrations.RunSQL(
+            'CREATE INDEX registries_person_unexpired_first_name ON registries_person (first_name, surname) '
+            'WHERE expired_date IS NULL',
+            'DROP INDEX registries_person_unexpired_first_name'),
+    ]
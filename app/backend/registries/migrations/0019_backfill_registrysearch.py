@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+# Builds the registry search entries of everyone, as registries.search.refresh_people does: one entry for
+# each person (that hasn't been removed) and activity, from their active registration, or else their first
+# one. It runs after 0015, so that the registrations' is_active flags are populated.
+INSERT_ENTRIES = """
+INSERT INTO registries_search (person_guid, registries_activity_code, registration_no, organization_guid,
+    organization_name, city, is_active, search_text)
+SELECT DISTINCT ON (registries_register.person_guid, registries_register.registries_activity_code)
+    registries_register.person_guid, registries_register.registries_activity_code,
+    registries_register.registration_no, registries_organization.org_guid, registries_organization.name,
+    registries_organization.city, registries_register.is_active,
+    lower(concat_ws(' | ', nullif(registries_person.first_name, ''), nullif(registries_person.surname, ''),
+                    nullif(registries_organization.name, ''), nullif(registries_organization.city, ''),
+                    nullif(registries_register.registration_no, '')))
+FROM registries_register
+INNER JOIN registries_person ON registries_person.person_guid = registries_register.person_guid
+LEFT JOIN registries_organization ON registries_organization.org_guid = registries_register.organization_guid
+WHERE registries_person.expired_date IS NULL
+ORDER BY registries_register.person_guid, registries_register.registries_activity_code,
+    registries_register.is_active DESC, registries_register.create_date
+ON CONFLICT (person_guid, registries_activity_code) DO NOTHING
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registries', '0018_person_unexpired_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(INSERT_ENTRIES, migrations.RunSQL.noop),
+    ]
@@ -176,6 +176,16 @@ class Organization(AuditModel):
         return '{} ({})'.format(self.name, location)
 
 
+class UnexpiredPersonManager(models.Manager):
+    """
+    People that haven't been removed from the register (expired). Served by the partial indexes on
+    unexpired people (see migration 0018_person_unexpired_indexes).
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(expired_date__isnull=True)
+
+
 @reversion.register()
 class Person(AuditModel):
     person_guid = models.UUIDField(
@@ -215,8 +225,14 @@ class Person(AuditModel):
     effective_date = models.DateField(default=datetime.date.today)
     expired_date = models.DateField(blank=True, null=True)
 
+    # True if the person has an active registration. Maintained by registries.search.
+    is_active = models.BooleanField(default=False, db_index=True, editable=False)
+
     history = GenericRelation(Version)
 
+    objects = models.Manager()
+    unexpired = UnexpiredPersonManager()
+
     class Meta:
         db_table = 'registries_person'
         ordering = ['first_name', 'surname']
@@ -324,11 +340,18 @@ class Register(AuditModel):
         related_name="registrations")
     registration_no = models.CharField(max_length=15, blank=True, null=True)
 
+    # True if the registration has an approved application that hasn't been removed. Maintained by
+    # registries.search.
+    is_active = models.BooleanField(default=False, editable=False)
+
     history = GenericRelation(Version)
 
     class Meta:
         db_table = 'registries_register'
         verbose_name_plural = 'Registrations'
+        indexes = [
+            models.Index(fields=['registries_activity', 'is_active'], name='registries_register_active'),
+        ]
 
     def __str__(self):
         return '%s - %s' % (
@@ -582,6 +605,60 @@ class PersonNote(AuditModel):
         return self.note[:20] + ('...' if len(self.note) > 20 else '')
 
 
+class RegistrySearch(models.Model):
+    """
+    Denormalized registry search, with one row for each person and activity they're registered for.
+    Maintained by registries.search, and used to search the public register without joining
+    registrations, applications and organizations.
+    """
+    person = models.ForeignKey(Person, db_column='person_guid', on_delete=models.CASCADE,
+                               related_name='search_entries')
+    registries_activity = models.ForeignKey(ActivityCode, db_column='registries_activity_code',
+                                            on_delete=models.CASCADE)
+    registration_no = models.CharField(max_length=15, blank=True, null=True)
+    organization = models.ForeignKey(Organization, db_column='organization_guid', blank=True, null=True,
+                                     on_delete=models.SET_NULL, related_name='+')
+    organization_name = models.CharField(max_length=200, blank=True, null=True)
+    city = models.CharField(max_length=50, blank=True, null=True)
+    # True if the person has an approved application, that hasn't been removed, for this activity.
+    is_active = models.BooleanField(default=False)
+    # Lower case names, organization name, city and registration number, searched with a trigram index.
+    search_text = models.TextField()
+
+    class Meta:
+        db_table = 'registries_search'
+        unique_together = (('person', 'registries_activity'),)
+        indexes = [
+            models.Index(fields=['registries_activity', 'is_active', 'city'], name='registries_search_active'),
+        ]
+
+    def __str__(self):
+        return '%s - %s' % (self.person_id, self.registries_activity_id)
+
+
+class RegistryCity(models.Model):
+    """
+    Summary of the cities with registrations for each activity, used for the city lists.
+    Maintained by registries.search.
+    """
+    registries_activity = models.ForeignKey(ActivityCode, db_column='registries_activity_code',
+                                            on_delete=models.CASCADE)
+    city = models.CharField(max_length=50)
+    province_state = models.ForeignKey(ProvinceStateCode, db_column='province_state_code', blank=True,
+                                       null=True, on_delete=models.SET_NULL, related_name='+')
+    # Number of registrations, and of active registrations, with an organization in the city.
+    registration_count = models.PositiveIntegerField(default=0)
+    active_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'registries_city'
+        unique_together = (('registries_activity', 'city'),)
+        ordering = ['city']
+
+    def __str__(self):
+        return '%s - %s' % (self.registries_activity_id, self.city)
+
+
 """
 Tue Apr 10 10:15:34 2018 Expose DB Views to Django
 """
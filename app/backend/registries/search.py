@@ -0,0 +1,223 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import logging
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count, Exists, Min, OuterRef, Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from gwells.versions import SharedVersion
+from registries.models import (Organization, Person, Register, RegistriesApplication, RegistryCity,
+                               RegistrySearch)
+
+
+logger = logging.getLogger(__name__)
+
+# The version of the city summaries, used to key the cached city lists.
+cities_version = SharedVersion('registry-cities')
+
+# Number of city summaries written by each upsert.
+UPSERT_BATCH_SIZE = 1000
+
+
+def search_text(*values):
+    """ The text searched for a registry entry """
+    return ' | '.join(value.lower() for value in values if value)
+
+
+def active_registrations():
+    """ Registrations with an approved application that hasn't been removed """
+    return Register.objects.annotate(active=Exists(RegistriesApplication.objects.filter(
+        registration=OuterRef('pk'), current_status='A', removal_date__isnull=True))) \
+        .filter(active=True)
+
+
+def refresh_active(person_guids):
+    """
+    Update the is_active flags of the given people and their registrations.
+    """
+    registrations = Register.objects.filter(person__in=person_guids)
+    active = active_registrations().filter(person__in=person_guids).values('pk')
+    registrations.filter(is_active=True).exclude(pk__in=active).update(is_active=False)
+    registrations.filter(is_active=False, pk__in=active).update(is_active=True)
+
+    people = Person.objects.filter(pk__in=person_guids)
+    active = Register.objects.filter(person__in=person_guids, is_active=True).values('person')
+    people.filter(is_active=True).exclude(pk__in=active).update(is_active=False)
+    people.filter(is_active=False, pk__in=active).update(is_active=True)
+
+
+def find_drift():
+    """
+    Returns the registrations and people whose is_active flags don't match their applications.
+    """
+    active = active_registrations().values('pk')
+    registrations = Register.objects.filter(
+        Q(is_active=True) & ~Q(pk__in=active) | Q(is_active=False, pk__in=active))
+    active = active_registrations().values('person')
+    people = Person.objects.filter(
+        Q(is_active=True) & ~Q(pk__in=active) | Q(is_active=False, pk__in=active))
+    return registrations, people
+
+
+@transaction.atomic
+def refresh_people(person_guids):
+    """
+    Update the is_active flags, and rebuild the registry search entries, of the given people, and the
+    summaries of the cities they're registered in.
+    """
+    person_guids = set(person_guids)
+    if not person_guids:
+        return
+    refresh_active(person_guids)
+    registrations = Register.objects \
+        .filter(person__in=Person.unexpired.filter(pk__in=person_guids)) \
+        .select_related('person', 'organization') \
+        .order_by('person', 'registries_activity', '-is_active', 'create_date')
+
+    entries = {}
+    for registration in registrations:
+        key = (registration.person_id, registration.registries_activity_id)
+        if key in entries:
+            # People should only have one registration per activity, if they have more, the active one
+            # (or else the first one) is used.
+            continue
+        organization = registration.organization
+        person = registration.person
+        entries[key] = RegistrySearch(
+            person=person,
+            registries_activity_id=registration.registries_activity_id,
+            registration_no=registration.registration_no,
+            organization=organization,
+            organization_name=organization.name if organization else None,
+            city=organization.city if organization else None,
+            is_active=registration.is_active,
+            search_text=search_text(person.first_name, person.surname,
+                                    organization.name if organization else None,
+                                    organization.city if organization else None,
+                                    registration.registration_no))
+
+    # The cities these people were, and are, registered in.
+    cities = set(RegistrySearch.objects.filter(person__in=person_guids, city__isnull=False)
+                 .values_list('registries_activity', 'city'))
+    cities.update(Register.objects.filter(person__in=person_guids, organization__city__isnull=False)
+                  .values_list('registries_activity', 'organization__city'))
+
+    RegistrySearch.objects.filter(person__in=person_guids).delete()
+    RegistrySearch.objects.bulk_create(entries.values())
+    refresh_cities(cities)
+
+
+def refresh_cities(cities=None):
+    """
+    Rebuild the city summaries of the given (activity, city) pairs, or of every city.
+    Summaries are upserted, so that refreshes running at the same time (e.g. saves of registrations in the
+    same city) don't conflict.
+    """
+    registrations = Register.objects \
+        .filter(organization__city__isnull=False) \
+        .exclude(organization__city='')
+    summaries = RegistryCity.objects.all()
+    if cities is not None:
+        cities = set(cities)
+        if not cities:
+            return
+        # Rebuilds every pair of these activities and cities, which includes the given pairs.
+        activities = {activity for activity, city in cities}
+        names = {city for activity, city in cities}
+        registrations = registrations.filter(registries_activity__in=activities, organization__city__in=names)
+        summaries = summaries.filter(registries_activity__in=activities, city__in=names)
+
+    totals = registrations \
+        .values('registries_activity', 'organization__city') \
+        .annotate(registration_count=Count('pk'),
+                  active_count=Count('pk', filter=Q(is_active=True)),
+                  province_state=Min('organization__province_state')) \
+        .order_by()
+    current = {(summary[0], summary[1]): summary[2:] for summary in summaries.values_list(
+        'registries_activity', 'city', 'province_state', 'registration_count', 'active_count')}
+
+    changed = []
+    for total in totals:
+        key = (total['registries_activity'], total['organization__city'])
+        values = (total['province_state'], total['registration_count'], total['active_count'])
+        if current.pop(key, None) != values:
+            changed.append(key + values)
+    if not changed and not current:
+        return
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(changed), UPSERT_BATCH_SIZE):
+            rows = changed[start:start + UPSERT_BATCH_SIZE]
+            values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))
+            cursor.execute(
+                'INSERT INTO registries_city (registries_activity_code, city, province_state_code, '
+                'registration_count, active_count) VALUES {} '
+                'ON CONFLICT (registries_activity_code, city) DO UPDATE SET '
+                'province_state_code = EXCLUDED.province_state_code, '
+                'registration_count = EXCLUDED.registration_count, '
+                'active_count = EXCLUDED.active_count'.format(values),
+                [value for row in rows for value in row])
+    # Cities that no longer have registrations.
+    stale = defaultdict(list)
+    for activity, city in current:
+        stale[activity].append(city)
+    for activity, names in stale.items():
+        RegistryCity.objects.filter(registries_activity=activity, city__in=names).delete()
+
+    # Discard the cached city lists in every process. Lists cached by this process (on other connections)
+    # before this change is committed are out of date too.
+    cities_version.bump()
+    transaction.on_commit(cities_version.expire)
+
+
+def refresh_all(batch_size=500):
+    """
+    Rebuild the registry search entries and city summaries of everyone, returning the number of people.
+    """
+    person_guids = list(Person.objects.values_list('person_guid', flat=True))
+    for start in range(0, len(person_guids), batch_size):
+        refresh_people(person_guids[start:start + batch_size])
+    # Remove entries for people that no longer exist.
+    RegistrySearch.objects.exclude(person__in=Person.objects.all()).delete()
+    refresh_cities()
+    return len(person_guids)
+
+
+@receiver(post_save, sender=Person)
+def person_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_people([instance.person_guid])
+
+
+@receiver(post_save, sender=Register)
+@receiver(post_delete, sender=Register)
+def registration_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_people([instance.person_id])
+
+
+@receiver(post_save, sender=RegistriesApplication)
+@receiver(post_delete, sender=RegistriesApplication)
+def application_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_people(Register.objects.filter(pk=instance.registration_id).values_list('person', flat=True))
+
+
+@receiver(post_save, sender=Organization)
+def organization_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_people(Register.objects.filter(organization=instance).values_list('person', flat=True))
@@ -14,8 +14,12 @@
 import logging
 from django.utils import timezone
 from django.db import transaction
+from django.db.models import Count, Prefetch, prefetch_related_objects
 import logging
+import reversion
 from rest_framework import serializers
+import registries.search
+from gwells.codes import code_tables
 from gwells.models import ProvinceStateCode
 from gwells.serializers import AuditModelSerializer, ProvinceStateCodeSerializer
 from registries.models import (
@@ -25,6 +29,7 @@ from registries.models import (
     Register,
     RegistriesApplication,
     RegistriesRemovalReason,
+    RegistryCity,
     ActivityCode,
     SubactivityCode,
     Qualification,
@@ -53,7 +58,7 @@ class ProofOfAgeCodeSerializer(serializers.ModelSerializer):
 
     def to_internal_value(self, data):
         if 'code' in data and data['code'] is not None:
-            return ProofOfAgeCode.objects.get(code=data['code'])
+            return code_tables.get(ProofOfAgeCode, data['code'])
         return super().to_internal_value(data)
 
 
@@ -129,8 +134,7 @@ class SubactivitySerializer(serializers.ModelSerializer):
 
     def to_internal_value(self, data):
         if 'registries_subactivity_code' in data and data['registries_subactivity_code'] is not None:
-            return SubactivityCode.objects.get(
-                registries_subactivity_code=data['registries_subactivity_code'])
+            return code_tables.get(SubactivityCode, data['registries_subactivity_code'])
         return super().to_internal_value(data)
 
 
@@ -145,7 +149,7 @@ class ApplicationStatusCodeSerializer(serializers.ModelSerializer):
 
     def to_internal_value(self, data):
         if 'code' in data and data['code'] is not None:
-            return ApplicationStatusCode.objects.get(code=data['code'])
+            return code_tables.get(ApplicationStatusCode, data['code'])
         return super().to_internal_value(self)
 
 
@@ -317,15 +321,21 @@ class OrganizationAdminSerializer(AuditModelSerializer):
         """
         Get sorted notes
         """
-        notes = OrganizationNote.objects \
-            .filter(organization=obj.org_guid) \
-            .order_by('-date') \
-            .select_related('author', 'author__profile')
+        if 'notes' in getattr(obj, '_prefetched_objects_cache', {}):
+            # Prefetched in order (see organization_admin_prefetches)
+            notes = obj.notes.all()
+        else:
+            notes = OrganizationNote.objects \
+                .filter(organization=obj.org_guid) \
+                .order_by('-date') \
+                .select_related('author', 'author__profile')
         serializer = OrganizationNoteSerializer(instance=notes, many=True)
         return serializer.data
 
     def get_registrations_count(self, obj):
         """ count registration records """
+        if hasattr(obj, 'registrations_count'):
+            return obj.registrations_count
         return obj.registrations.count()
 
 
@@ -373,7 +383,7 @@ class AccreditedCertificateCodeSerializer(serializers.ModelSerializer):
 
     def to_internal_value(self, data):
         if 'acc_cert_guid' in data and data['acc_cert_guid'] is not None:
-            return AccreditedCertificateCode.objects.get(acc_cert_guid=data['acc_cert_guid'])
+            return code_tables.get(AccreditedCertificateCode, data['acc_cert_guid'])
         return super().to_internal_value(data)
 
 
@@ -451,8 +461,7 @@ class ApplicationAdminSerializer(AuditModelSerializer):
         """
         if 'current_status' not in validated_data:
             # By default we set the ApplicationStatus to P(ending).
-            validated_data['current_status'] = ApplicationStatusCode.objects.get(
-                code='P')
+            validated_data['current_status'] = code_tables.get(ApplicationStatusCode, 'P')
         try:
             app = RegistriesApplication.objects.create(**validated_data)
         except TypeError:
@@ -500,41 +509,15 @@ class RegistrationAdminSerializer(AuditModelSerializer):
 class CityListSerializer(serializers.ModelSerializer):
     """
     Serializes city and province fields for list of cities with qualified drillers
-    The queryset is limited to one record per unique city in the Person table
-    The OrganizationSerializer fields are used to fill in city, province data
     """
 
-    organization = OrganizationSerializer()
-
     class Meta:
-        model = Register
+        model = RegistryCity
         fields = (
-            'organization',
-        )
-
-    def to_representation(self, instance):
-        """
-        Flattens City list response to make an array of { city: '', province_state: '' } objects
-        """
-        repr = super().to_representation(instance)
-
-        # remove and store nested objects
-        org = repr.pop('organization')
-
-        # specify fields from OrganizationSerializer
-        company_fields = (
             'city',
             'province_state',
         )
 
-        for field in company_fields:
-            if org and org[field]:
-                repr[field] = org[field]
-            else:
-                repr[field] = None
-
-        return repr
-
 
 class PersonListSerializer(AuditModelSerializer):
     """
@@ -632,24 +615,73 @@ class RegistrationAutoCreateSerializer(AuditModelSerializer):
         )
 
 
+def organization_admin_prefetches(lookup=None):
+    """
+    Prefetches for the organizations serialized by OrganizationAdminSerializer, with the
+    organization notes in the order they're displayed. lookup is the path to the organizations,
+    if they're being prefetched from another model.
+    """
+    prefix = '{}__'.format(lookup) if lookup else ''
+    prefetches = [
+        Prefetch(prefix + 'notes', queryset=OrganizationNote.objects
+                 .select_related('author', 'author__profile')
+                 .order_by('-date')),
+    ]
+    if lookup:
+        prefetches.insert(0, Prefetch(lookup, queryset=Organization.objects
+                                      .select_related('province_state')
+                                      .annotate(registrations_count=Count('registrations'))))
+    return prefetches
+
+
+def person_admin_prefetches():
+    """
+    Prefetches for the people serialized by PersonAdminSerializer, with the registrations and
+    notes in the order they're displayed.
+    """
+    return [
+        Prefetch('notes', queryset=PersonNote.objects
+                 .select_related('author', 'author__profile')
+                 .order_by('-date')),
+        Prefetch('registrations', queryset=Register.objects
+                 .select_related('registries_activity')
+                 .order_by('registries_activity')),
+        Prefetch('registrations__applications', queryset=RegistriesApplication.objects
+                 .select_related(
+                     'current_status',
+                     'primary_certificate',
+                     'primary_certificate__cert_auth',
+                     'proof_of_age',
+                     'removal_reason',
+                     'subactivity',
+                 )),
+        'registrations__applications__subactivity__qualification_set',
+        'registrations__applications__subactivity__qualification_set__well_class',
+    ] + organization_admin_prefetches('registrations__organization')
+
+
 class PersonAdminSerializer(AuditModelSerializer):
     """
     Serializes the Person model (admin user fields)
+
+    The registrations and notes are read from the prefetched objects (see person_admin_prefetches),
+    they're prefetched here if the view hasn't done so.
     """
 
     # registrations = RegistrationAdminSerializer(many=True)
     registrations = serializers.SerializerMethodField()
     notes = serializers.SerializerMethodField()
 
+    def prefetch(self, person):
+        # Lookups that have already been prefetched are skipped.
+        prefetch_related_objects([person], *person_admin_prefetches())
+
     def get_notes(self, obj):
         """
         Get sorted notes
         """
-        notes = PersonNote.objects \
-            .filter(person=obj.person_guid) \
-            .order_by('-date') \
-            .select_related('author', 'author__profile')
-        serializer = PersonNoteSerializer(instance=notes, many=True)
+        self.prefetch(obj)
+        serializer = PersonNoteSerializer(instance=obj.notes.all(), many=True)
         return serializer.data
 
     def __init__(self, *args, **kwargs):
@@ -674,14 +706,27 @@ class PersonAdminSerializer(AuditModelSerializer):
 
         person = Person.objects.create(**validated_data)
 
+        # The registrations and applications are inserted in bulk. bulk_create doesn't call save(), so the
+        # audit dates are populated here, and the records added to the revision (if there is one) by hand.
+        now = timezone.now()
+        audit_info = {**audit_info, 'create_date': now, 'update_date': now}
+        registers = []
+        apps = []
         for reg_data in registrations:
             reg_data = {**reg_data, **audit_info}
             applications = reg_data.pop('applications', list())
-            register = Register.objects.create(person=person, **reg_data)
+            register = Register(person=person, **reg_data)
+            registers.append(register)
             for app_data in applications:
                 app_data = {**app_data, **audit_info}
-                app = RegistriesApplication.objects.create(
-                    registration=register, **app_data)
+                apps.append(RegistriesApplication(registration=register, **app_data))
+        Register.objects.bulk_create(registers)
+        RegistriesApplication.objects.bulk_create(apps)
+        if reversion.is_active():
+            for obj in registers + apps:
+                reversion.add_to_revision(obj)
+        # The search entries aren't updated by signals when inserting in bulk.
+        registries.search.refresh_people([person.person_guid])
 
         return Person.objects.get(person_guid=person.person_guid)
 
@@ -697,21 +742,9 @@ class PersonAdminSerializer(AuditModelSerializer):
         """
         Get sorted list of registrations
         """
-        registrations = [
-            reg for reg in person.registrations.order_by('registries_activity')
-            .select_related('registries_activity', 'organization', 'organization__province_state')
-            .prefetch_related(
-                'applications',
-                'applications__current_status',
-                'applications__primary_certificate',
-                'applications__primary_certificate__cert_auth',
-                'applications__subactivity',
-                'applications__subactivity__qualification_set',
-                'applications__subactivity__qualification_set__well_class'
-            )
-        ]
+        self.prefetch(person)
         serializer = RegistrationAdminSerializer(
-            instance=registrations, many=True)
+            instance=person.registrations.all(), many=True)
         return serializer.data
 
     class Meta:
@@ -14,10 +14,16 @@
 import uuid
 import logging
 import os
+import tempfile
+import zipfile
+import reversion
 
 from django.urls import reverse
 from django.test import TestCase
+from django.core.cache import cache
 from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.six import StringIO
 from django.contrib.auth.models import User, Group
 
@@ -25,14 +31,24 @@ from rest_framework import status
 from rest_framework.test import APITestCase, APIRequestFactory
 
 from gwells.models import ProvinceStateCode, Profile
+from gwells.pagination import APILimitOffsetPagination
 from registries.models import (
+    AccreditedCertificateCode,
     ApplicationStatusCode,
+    CertifyingAuthorityCode,
     Organization,
+    OrganizationNote,
     Person,
+    PersonNote,
     RegistriesApplication,
     Register,
     ActivityCode,
-    SubactivityCode)
+    SubactivityCode,
+    Qualification,
+    RegistryCity,
+    RegistrySearch,
+    WellClassCode)
+from registries.search import cities_version, refresh_cities
 from registries.views import PersonListView, PersonDetailView
 from gwells.roles import (roles_to_groups,
                           REGISTRIES_ADJUDICATOR_ROLE, ADMIN_ROLE, REGISTRIES_AUTHORITY_ROLE,
@@ -112,6 +128,37 @@ class PersonTests(TestCase):
         person = Person.objects.get(first_name='Bobby')
         self.assertEqual(person.first_name, 'Bobby')
 
+    def test_unexpired_manager(self):
+        Person.objects.create(first_name='Robin', surname='Removed', expired_date='2018-01-01')
+        self.assertEqual(Person.objects.count(), 2)
+        self.assertEqual([person.first_name for person in Person.unexpired.all()], ['Bobby'])
+
+    def test_list_query_uses_partial_index(self):
+        # The public list, as built by the view, is served from the partial index on unexpired people
+        # once there are enough people for an index scan to be worth it.
+        drill = ActivityCode.objects.create(
+            registries_activity_code='DRILL', description='driller', display_order=1)
+        people = Person.objects.bulk_create(
+            Person(first_name='First {}'.format(i), surname='Surname {:04}'.format(i),
+                   expired_date='2018-01-01' if i % 10 == 0 else None)
+            for i in range(3000))
+        RegistrySearch.objects.bulk_create(
+            RegistrySearch(person=person, registries_activity=drill, is_active=True,
+                           search_text=person.surname.lower())
+            for person in people)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE registries_person')
+            cursor.execute('ANALYZE registries_search')
+
+        view = PersonListView()
+        view.request = view.initialize_request(APIRequestFactory().get(reverse('person-list'),
+                                                                       {'activity': 'DRILL'}))
+        view.format_kwarg = None
+        view.kwargs = {}
+        queryset = view.filter_queryset(view.get_queryset())[:APILimitOffsetPagination.default_limit]
+        plan = queryset.explain()
+        self.assertIn('registries_person_unexpired_surname', plan)
+
 
 class RegistriesApplicationTestBase(AuthenticatedAPITestCase):
     """
@@ -266,6 +313,44 @@ class APIOrganizationTests(AuthenticatedAPITestCase):
         self.assertEqual(len(created_guid), 36)
         self.assertContains(response, created_guid)
 
+    def test_list_organization_pages(self):
+        url = reverse('organization-list')
+        for name in ('A Drilling', 'B Drilling', 'C Drilling'):
+            self.client.post(url, {**self.initial_data, 'name': name}, format='json')
+
+        # Without paging parameters the whole list is returned, as before.
+        response = self.client.get(url, format='json')
+        self.assertEqual(len(response.data), 3)
+
+        response = self.client.get(url, {'limit': 2, 'offset': 1}, format='json')
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([org['name'] for org in response.data['results']], ['B Drilling', 'C Drilling'])
+
+    def test_retrieve_organization_counts(self):
+        organization = self.client.post(reverse('organization-list'), self.initial_data, format='json')
+        org_guid = organization.data['org_guid']
+        activity = ActivityCode.objects.create(
+            registries_activity_code='DRILL', description='driller', display_order=1)
+
+        def add_registration(surname, note):
+            person = Person.objects.create(first_name='Bobby', surname=surname)
+            Register.objects.create(person=person, registries_activity=activity, organization_id=org_guid)
+            OrganizationNote.objects.create(organization_id=org_guid, author=self.user, note=note)
+
+        url = reverse('organization-detail', kwargs={'org_guid': org_guid})
+        add_registration('One', 'first')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, format='json')
+        self.assertEqual(response.data['registrations_count'], 1)
+
+        # The count and the notes come from the view's queryset, so there are no more queries with
+        # more of them.
+        add_registration('Two', 'second')
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.client.get(url, format='json')
+        self.assertEqual(response.data['registrations_count'], 2)
+        self.assertEqual([note['note'] for note in response.data['notes']], ['second', 'first'])
+
     def test_retrieve_organization(self):
         create_url = reverse('organization-list')
         new_object = self.client.post(
@@ -452,6 +537,119 @@ class APIPersonTests(AuthenticatedAPITestCase):
             person_guid=created_guid).surname)
         self.assertEqual(Person.objects.count(), count_before + 1)
 
+    def test_create_person_with_registrations(self):
+        # Registrations and applications are created along with the person.
+        drill = ActivityCode.objects.create(
+            registries_activity_code='DRILL', description='driller', display_order=1)
+        pump = ActivityCode.objects.create(
+            registries_activity_code='PUMP', description='pump installer', display_order=2)
+        SubactivityCode.objects.create(
+            registries_activity=pump, registries_subactivity_code='PUMPINST',
+            description='Pump Installer', display_order=4)
+        data = {
+            'first_name': 'Bobby',
+            'surname': 'Driller',
+            'registrations': [
+                {'registries_activity': 'DRILL', 'registration_no': 'F1'},
+                {
+                    'registries_activity': 'PUMP',
+                    'registration_no': 'F2',
+                    'applications': [
+                        {
+                            'subactivity': {'registries_subactivity_code': 'PUMPINST'},
+                            'primary_certificate_no': '123',
+                        },
+                    ],
+                },
+            ]
+        }
+
+        response = self.client.post(reverse('person-list'), data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        registrations = Register.objects.filter(person=response.data['person_guid'])
+        self.assertEqual(
+            sorted(registrations.values_list('registration_no', flat=True)), ['F1', 'F2'])
+        self.assertTrue(all(registration.create_date for registration in registrations))
+        application = RegistriesApplication.objects.get(registration__registration_no='F2')
+        self.assertEqual(application.subactivity.registries_subactivity_code, 'PUMPINST')
+        self.assertIsNotNone(application.create_date)
+
+    def test_retrieve_person_queries(self):
+        # The registrations, applications, organizations and notes come from the view's prefetches, so
+        # the number of queries doesn't depend on how many there are.
+        drill = ActivityCode.objects.create(
+            registries_activity_code='DRILL', description='driller', display_order=1)
+        pump = ActivityCode.objects.create(
+            registries_activity_code='PUMP', description='pump installer', display_order=2)
+        approved = ApplicationStatusCode.objects.create(code='A', description='Approved', display_order=1)
+        person = Person.objects.create(first_name='Bobby', surname='Driller')
+        url = reverse('person-detail', kwargs={'person_guid': person.person_guid})
+
+        def add_registration(activity, subactivity_code):
+            organization = Organization.objects.create(
+                name='Drilling Co {}'.format(subactivity_code), province_state=self.prov)
+            OrganizationNote.objects.create(organization=organization, author=self.user, note='note')
+            PersonNote.objects.create(person=person, author=self.user, note='note')
+            registration = Register.objects.create(
+                person=person, registries_activity=activity, organization=organization)
+            subactivity = SubactivityCode.objects.create(
+                registries_activity=activity, registries_subactivity_code=subactivity_code,
+                description=subactivity_code, display_order=1)
+            RegistriesApplication.objects.create(
+                registration=registration, current_status=approved, subactivity=subactivity)
+
+        add_registration(drill, 'WATER')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, format='json')
+        self.assertEqual(len(response.data['registrations']), 1)
+
+        add_registration(pump, 'PUMPINST')
+        add_registration(drill, 'GEOTECH')
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.client.get(url, format='json')
+        self.assertEqual(len(response.data['registrations']), 3)
+        self.assertEqual(len(response.data['notes']), 3)
+        # Registrations are ordered by activity.
+        activities = [registration['registries_activity'] for registration in response.data['registrations']]
+        self.assertEqual(activities, ['DRILL', 'DRILL', 'PUMP'])
+
+    def test_person_history_queries(self):
+        # The versions are fetched in one query, so the number of queries doesn't depend on how many
+        # registrations and applications there are.
+        drill = ActivityCode.objects.create(
+            registries_activity_code='DRILL', description='driller', display_order=1)
+        approved = ApplicationStatusCode.objects.create(code='A', description='Approved', display_order=1)
+        with reversion.create_revision():
+            person = Person.objects.create(first_name='Bobby', surname='Driller')
+        url = reverse('person-history', kwargs={'person_guid': person.person_guid})
+
+        def add_registration(code):
+            subactivity = SubactivityCode.objects.create(
+                registries_activity=drill, registries_subactivity_code=code, description=code,
+                display_order=1)
+            with reversion.create_revision():
+                registration = Register.objects.create(person=person, registries_activity=drill)
+                RegistriesApplication.objects.create(
+                    registration=registration, current_status=approved, subactivity=subactivity)
+            with reversion.create_revision():
+                registration.registration_no = code
+                registration.save()
+
+        add_registration('WATER')
+        # The content types are cached by the first request.
+        self.client.get(url, format='json')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, format='json')
+        self.assertEqual(len(response.data), 4)
+
+        add_registration('GEOTECH')
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        changes = [item['diff'] for item in response.data if item['diff']]
+        self.assertEqual(sorted(diff['registration_no'] for diff in changes), ['GEOTECH', 'WATER'])
+
     def test_list_people(self):
         url = reverse('person-list')
         new_object = self.client.post(url, self.initial_data, format='json')
@@ -911,6 +1109,269 @@ class TestPublicSearch(TestCase):
         self.assertContains(response, 'Approved', 2)
 
 
+class TestPersonOptions(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.drill = ActivityCode.objects.create(
+            registries_activity_code='DRILL', description='driller', display_order=1)
+        self.add_activity_codes(self.drill, 'WATER', 'WATER')
+
+    def add_activity_codes(self, activity, subactivity_code, well_class_code):
+        subactivity = SubactivityCode.objects.create(
+            registries_activity=activity, registries_subactivity_code=subactivity_code,
+            description=subactivity_code, display_order=1)
+        well_class = WellClassCode.objects.create(
+            registries_well_class_code=well_class_code, description=well_class_code, display_order=1)
+        Qualification.objects.create(well_class=well_class, subactivity=subactivity, display_order=1)
+        cert_auth = CertifyingAuthorityCode.objects.create(cert_auth_code=subactivity_code)
+        AccreditedCertificateCode.objects.create(
+            cert_auth=cert_auth, registries_activity=activity, name=subactivity_code)
+
+    def test_options_built_in_fixed_queries(self):
+        url = reverse('person-options')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.data['DRILL']['well_class_codes'][0]['registries_well_class_code'], 'WATER')
+
+        pump = ActivityCode.objects.create(
+            registries_activity_code='PUMP', description='pump installer', display_order=2)
+        self.add_activity_codes(pump, 'PUMPINST', 'PUMP')
+        self.add_activity_codes(self.drill, 'GEOTECH', 'GEOTECH')
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['DRILL']['subactivity_codes']), 2)
+        self.assertEqual(response.data['PUMP']['accredited_certificate_codes'][0]['name'], 'PUMPINST')
+
+    def test_options_not_modified(self):
+        url = reverse('person-options')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        last_modified = response['Last-Modified']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_options_validators_same_in_every_process(self):
+        # Another process (with nothing cached) gives the same options the same validators.
+        url = reverse('person-options')
+        response = self.client.get(url)
+        etag = response['ETag']
+        last_modified = response['Last-Modified']
+        cache.clear()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['Last-Modified'], last_modified)
+
+    def test_options_invalidated_by_code_table_change(self):
+        url = reverse('person-options')
+        etag = self.client.get(url)['ETag']
+        self.add_activity_codes(self.drill, 'GEOTECH', 'GEOTECH')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data['DRILL']['subactivity_codes']), 2)
+
+
+class TestPersonNameSearch(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_search_ranked_and_limited(self):
+        Person.objects.create(first_name='Alex', surname='Blacksmith')
+        for index in range(25):
+            Person.objects.create(first_name='Sam {}'.format(index), surname='Smith')
+        response = self.client.get(reverse('person-search'), {'search': 'smith'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Only the top matches are returned, and names starting with the search come first.
+        self.assertEqual(len(response.data), 20)
+        self.assertNotIn('Alex Blacksmith', [person['name'] for person in response.data])
+
+        response = self.client.get(reverse('person-search'), {'search': 'alex smith'})
+        self.assertEqual([person['name'] for person in response.data], ['Alex Blacksmith'])
+
+
+class TestRegistrySearch(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.activity_drill = ActivityCode.objects.create(
+            registries_activity_code="DRILL",
+            description="driller",
+            display_order="1")
+        self.status_approved = ApplicationStatusCode.objects.create(
+            code="A",
+            description="Approved",
+            display_order="3")
+        self.subactivity = SubactivityCode.objects.create(
+            registries_activity=self.activity_drill,
+            registries_subactivity_code='WATER',
+            description='water',
+            display_order=1)
+        self.organization = Organization.objects.create(
+            name='Big Drilling Co', city='Atlin', province_state=ProvinceStateCode.objects.get_or_create(
+                province_state_code='BC', defaults={'display_order': 1})[0])
+        self.person = Person.objects.create(first_name='Wendy', surname='Well')
+        self.registration = Register.objects.create(
+            person=self.person,
+            registries_activity=self.activity_drill,
+            organization=self.organization,
+            registration_no='F12345')
+        self.application = RegistriesApplication.objects.create(
+            registration=self.registration,
+            current_status=self.status_approved,
+            subactivity=self.subactivity)
+
+    def test_entry_maintained(self):
+        entry = RegistrySearch.objects.get(person=self.person, registries_activity=self.activity_drill)
+        self.assertTrue(entry.is_active)
+        self.assertEqual(entry.city, 'Atlin')
+        # Removing the application makes the entry inactive.
+        self.application.removal_date = '2018-01-01'
+        self.application.save()
+        entry.refresh_from_db()
+        self.assertFalse(entry.is_active)
+
+    def test_public_search_by_organization(self):
+        url = reverse('person-list')
+        response = self.client.get(url, {'search': 'big drilling', 'activity': 'DRILL'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.organization.name = 'Small Drilling Co'
+        self.organization.save()
+        response = self.client.get(url, {'search': 'big drilling', 'activity': 'DRILL'}, format='json')
+        self.assertEqual(response.data['count'], 0)
+
+    def test_city_list_maintained(self):
+        cache.clear()
+        url = reverse('city-list-drillers')
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'city': 'Atlin', 'province_state': 'BC'}])
+        city = RegistryCity.objects.get(registries_activity=self.activity_drill, city='Atlin')
+        self.assertEqual((city.registration_count, city.active_count), (1, 1))
+        self.assertEqual(self.client.get(reverse('city-list-installers'), format='json').data, [])
+
+        # The cached list is discarded when the city changes.
+        self.organization.city = 'Duncan'
+        self.organization.save()
+        response = self.client.get(url, format='json')
+        self.assertEqual([city['city'] for city in response.data], ['Duncan'])
+        self.assertFalse(RegistryCity.objects.filter(city='Atlin').exists())
+
+        # Cities without active registrations aren't listed for the public.
+        self.application.removal_date = '2018-01-01'
+        self.application.save()
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.data, [])
+
+    def test_public_list_not_ordered_by_organization(self):
+        # Ordering by organization would list the person once for each of their registrations.
+        pump = ActivityCode.objects.create(
+            registries_activity_code='PUMP', description='pump installer', display_order=2)
+        organization = Organization.objects.create(
+            name='Pump Co', city='Duncan', province_state=self.organization.province_state)
+        Register.objects.create(person=self.person, registries_activity=pump, organization=organization)
+        response = self.client.get(reverse('person-list'),
+                                   {'activity': 'DRILL', 'ordering': 'registrations__organization__name'},
+                                   format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+
+    def test_refresh_cities_upserts(self):
+        # A summary written by another refresh in the meantime is updated, rather than inserted again.
+        RegistryCity.objects.filter(city='Atlin').update(registration_count=5, active_count=0)
+        version = cities_version.version()
+        refresh_cities([(self.activity_drill.pk, 'Atlin')])
+        city = RegistryCity.objects.get(registries_activity=self.activity_drill, city='Atlin')
+        self.assertEqual((city.registration_count, city.active_count), (1, 1))
+        self.assertNotEqual(cities_version.version(), version)
+
+        # Nothing changed, so the cached lists are kept.
+        version = cities_version.version()
+        refresh_cities([(self.activity_drill.pk, 'Atlin')])
+        self.assertEqual(cities_version.version(), version)
+
+    def test_active_flags_maintained(self):
+        self.person.refresh_from_db()
+        self.registration.refresh_from_db()
+        self.assertTrue(self.person.is_active)
+        self.assertTrue(self.registration.is_active)
+        # Removing the application makes the registration and person inactive.
+        self.application.removal_date = '2018-01-01'
+        self.application.save()
+        self.person.refresh_from_db()
+        self.registration.refresh_from_db()
+        self.assertFalse(self.person.is_active)
+        self.assertFalse(self.registration.is_active)
+
+    def test_check_active_registrations_repairs_drift(self):
+        # Updates don't send signals, so the flags drift.
+        Register.objects.filter(pk=self.registration.pk).update(is_active=False)
+        Person.objects.filter(pk=self.person.pk).update(is_active=False)
+        out = StringIO()
+        call_command('check_active_registrations', stdout=out)
+        self.assertIn('drifted for 1 people', out.getvalue())
+        self.assertFalse(Person.objects.get(pk=self.person.pk).is_active)
+
+        call_command('check_active_registrations', '--repair', stdout=out)
+        self.assertTrue(Person.objects.get(pk=self.person.pk).is_active)
+        self.assertTrue(Register.objects.get(pk=self.registration.pk).is_active)
+        out = StringIO()
+        call_command('check_active_registrations', stdout=out)
+        self.assertIn('consistent', out.getvalue())
+
+
+class TestExportRegistries(TestCase):
+
+    def setUp(self):
+        activity = ActivityCode.objects.create(
+            registries_activity_code="DRILL",
+            description="driller",
+            display_order="1")
+        status_approved = ApplicationStatusCode.objects.create(
+            code="A",
+            description="Approved",
+            display_order="3")
+        subactivity = SubactivityCode.objects.create(
+            registries_activity=activity,
+            registries_subactivity_code='WATER',
+            description='water',
+            display_order=1)
+        organization = Organization.objects.create(
+            name='Big Drilling Co', city='Atlin', province_state=ProvinceStateCode.objects.get_or_create(
+                province_state_code='BC', defaults={'display_order': 1})[0])
+        person = Person.objects.create(first_name='Wendy', surname='Well')
+        registration = Register.objects.create(
+            person=person,
+            registries_activity=activity,
+            organization=organization,
+            registration_no='F12345')
+        RegistriesApplication.objects.create(
+            registration=registration,
+            current_status=status_approved,
+            subactivity=subactivity)
+
+    def test_export_registries(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                call_command('export_registries', '--no-upload', stdout=StringIO())
+                with zipfile.ZipFile('registries.zip') as registries_zip:
+                    registrants = registries_zip.read('registrant.csv').decode('utf-8')
+                    organizations = registries_zip.read('organization.csv').decode('utf-8')
+                self.assertTrue(os.path.exists('registries.xlsx'))
+            finally:
+                os.chdir(cwd)
+        self.assertIn('Wendy,Well', registrants)
+        self.assertIn('Big Drilling Co', organizations)
+
+
 class TestAuthenticatedSearch(AuthenticatedAPITestCase):
 
     def setUp(self):
@@ -87,6 +87,8 @@ urlpatterns = [
         never_cache(views.PersonNameSearch.as_view()), name='person-search'),
     url(r'api/v1/drillers/options/',
         views.PersonOptionsView.as_view(), name='person-options'),
+    url(r'^api/v1/drillers/extracts/$',
+        views.ListExtracts.as_view(), name='registries-extract-list'),
     url(r'^api/v1/drillers/(?P<person_guid>[-\w]+)/history/$',
         never_cache(views.PersonHistory.as_view()), name='person-history'),
     url(r'^api/v1/drillers/(?P<person_guid>[-\w]+)/$',
@@ -12,12 +12,20 @@
     limitations under the License.
 """
 
+import hashlib
+import json
 import reversion
-from collections import OrderedDict
-from django.db.models import Q, Prefetch
+import registries.search
+from collections import defaultdict, OrderedDict
+from urllib.parse import quote
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Q, Prefetch
 from django.http import HttpResponse, Http404, JsonResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
 from django.views.generic import TemplateView
 from django_filters import rest_framework as restfilters
 from drf_yasg import openapi
@@ -30,6 +38,9 @@ from rest_framework.response import Response
 from rest_framework.mixins import CreateModelMixin, UpdateModelMixin
 from rest_framework.views import APIView
 from drf_multiple_model.views import ObjectMultipleModelAPIView
+from minio import Minio
+from gwells.autocomplete import AutocompleteMixin
+from gwells.codes import code_tables
 from gwells.documents import MinioClient
 from gwells.roles import REGISTRIES_VIEWER_ROLE
 from gwells.models import ProvinceStateCode
@@ -46,11 +57,14 @@ from registries.models import (
     Person,
     PersonNote,
     ProofOfAgeCode,
+    Qualification,
     Register,
     RegistriesApplication,
+    RegistryCity,
+    RegistrySearch,
     RegistriesRemovalReason,
-    SubactivityCode,
-    WellClassCode)
+    SubactivityCode)
+from registries.exports import EXPORT_PREFIX, export_bucket
 from registries.permissions import IsAdminOrReadOnly, RegistriesPermissions
 from registries.serializers import (
     ApplicationAdminSerializer,
@@ -71,7 +85,9 @@ from registries.serializers import (
     WellClassCodeSerializer,
     AccreditedCertificateCodeSerializer,
     OrganizationNoteSerializer,
-    PersonNameSerializer)
+    PersonNameSerializer,
+    organization_admin_prefetches,
+    person_admin_prefetches)
 from gwells.change_history import generate_history_diff
 
 
@@ -117,12 +133,12 @@ class OrganizationListView(RevisionMixin, AuditCreateMixin, ListCreateAPIView):
 
     permission_classes = (RegistriesPermissions,)
     serializer_class = OrganizationListSerializer
-    pagination_class = None
+    pagination_class = APILimitOffsetPagination
 
-    # prefetch related objects for the queryset to prevent duplicate database trips later
+    # The list serializer doesn't include registrations, so only the province is fetched with the
+    # organizations.
     queryset = Organization.objects.all() \
         .select_related('province_state',) \
-        .prefetch_related('registrations', 'registrations__person') \
         .filter(expired_date__isnull=True)
 
     # Allow searching against fields like organization name, address,
@@ -137,6 +153,19 @@ class OrganizationListView(RevisionMixin, AuditCreateMixin, ListCreateAPIView):
         'registrations__applications__file_no'
     )
 
+    @property
+    def paginator(self):
+        """
+        The whole list is returned, unless a page is asked for with ?limit= or ?offset=
+        """
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if 'limit' in params or 'offset' in params:
+                self._paginator = self.pagination_class()
+            else:
+                self._paginator = None
+        return self._paginator
+
 
 class OrganizationDetailView(RevisionMixin, AuditUpdateMixin, RetrieveUpdateDestroyAPIView):
     """
@@ -159,10 +188,12 @@ class OrganizationDetailView(RevisionMixin, AuditUpdateMixin, RetrieveUpdateDest
     lookup_field = "org_guid"
     serializer_class = OrganizationAdminSerializer
 
-    # prefetch related province, contacts and person records to prevent future additional database trips
+    # prefetch related province, contacts, person records and notes, and count the registrations, to
+    # prevent future additional database trips
     queryset = Organization.objects.all() \
         .select_related('province_state',) \
-        .prefetch_related('registrations', 'registrations__person') \
+        .annotate(registrations_count=Count('registrations')) \
+        .prefetch_related('registrations', 'registrations__person', *organization_admin_prefetches()) \
         .filter(expired_date__isnull=True)
 
     def destroy(self, request, *args, **kwargs):
@@ -182,52 +213,96 @@ class OrganizationDetailView(RevisionMixin, AuditUpdateMixin, RetrieveUpdateDest
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+def build_person_options():
+    """
+    Builds the options for the person forms, in a fixed number of queries.
+    """
+    subactivities = SubactivityCode.objects \
+        .order_by('display_order') \
+        .prefetch_related(Prefetch('qualification_set',
+                                   queryset=Qualification.objects.select_related('well_class')))
+    certificates = AccreditedCertificateCode.objects \
+        .select_related('cert_auth') \
+        .order_by('name')
+
+    # Subactivities, qualified well classes and certificates of each activity
+    activity_subactivities = defaultdict(list)
+    activity_well_classes = defaultdict(dict)
+    for subactivity in subactivities:
+        activity_subactivities[subactivity.registries_activity_id].append(subactivity)
+        for qualification in subactivity.qualification_set.all():
+            well_class = qualification.well_class
+            activity_well_classes[subactivity.registries_activity_id][well_class.pk] = well_class
+    activity_certificates = defaultdict(list)
+    for certificate in certificates:
+        activity_certificates[certificate.registries_activity_id].append(certificate)
+
+    result = {}
+    for activity in ActivityCode.objects.all():
+        code = activity.registries_activity_code
+        well_classes = sorted(activity_well_classes[code].values(),
+                              key=lambda well_class: well_class.registries_well_class_code)
+        result[code] = {
+            'well_class_codes': WellClassCodeSerializer(well_classes, many=True).data,
+            'subactivity_codes': SubactivitySerializer(activity_subactivities[code], many=True).data,
+            'accredited_certificate_codes':
+                AccreditedCertificateCodeSerializer(activity_certificates[code], many=True).data,
+        }
+    result['proof_of_age_codes'] = ProofOfAgeCodeSerializer(
+        ProofOfAgeCode.objects.all().order_by('display_order'), many=True).data
+    result['approval_outcome_codes'] = ApplicationStatusCodeSerializer(
+        ApplicationStatusCode.objects.all(), many=True).data
+    result['reason_removed_codes'] = RegistriesRemovalReasonSerializer(
+        RegistriesRemovalReason.objects.all(), many=True).data
+    result['province_state_codes'] = ProvinceStateCodeSerializer(
+        ProvinceStateCode.objects.all().order_by('display_order'), many=True).data
+
+    return result
+
+
+# Seconds the person options are cached for (they are rebuilt sooner if a code table changes).
+PERSON_OPTIONS_CACHE_TIMEOUT = 60 * 60
+
+
+def get_person_options():
+    """
+    Return the person options, a strong ETag for them, and when they were last modified.
+    The options are cached for the current version of the code tables, which is shared by every process.
+    The validators are derived from shared data (a hash of the options, and when the code tables were
+    last changed), so that every process gives the same options the same validators.
+    """
+    key = 'person-options:{}'.format(code_tables.version())
+    cached = cache.get(key)
+    if cached is None:
+        options = build_person_options()
+        content = json.dumps(options, cls=DjangoJSONEncoder, sort_keys=True)
+        etag = quote_etag(hashlib.sha1(content.encode('utf-8')).hexdigest())
+        cached = (options, etag, int(code_tables.update_date().timestamp()))
+        cache.set(key, cached, PERSON_OPTIONS_CACHE_TIMEOUT)
+    return cached
+
+
 class PersonOptionsView(APIView):
 
     @swagger_auto_schema(auto_schema=None)
     def get(self, request, format=None):
-        result = {}
-        for activity in ActivityCode.objects.all():
-            # Well class query
-            well_class_query = WellClassCode \
-                .objects.filter(
-                    qualification__subactivity__registries_activity=activity.registries_activity_code) \
-                .order_by('registries_well_class_code').distinct('registries_well_class_code')
-            # Sub activity query
-            sub_activity_query = SubactivityCode \
-                .objects.filter(
-                    registries_activity=activity).order_by('display_order')
-            # Certificate code query
-            cert_code_query = AccreditedCertificateCode \
-                .objects.filter(
-                    registries_activity=activity.registries_activity_code) \
-                .order_by('name')
-
-            result[activity.registries_activity_code] = {
-                'well_class_codes':
-                    list(map(lambda item: WellClassCodeSerializer(
-                        item).data, well_class_query)),
-                'subactivity_codes':
-                    list(map(lambda item: SubactivitySerializer(
-                        item).data, sub_activity_query)),
-                'accredited_certificate_codes':
-                    list(map(lambda item: AccreditedCertificateCodeSerializer(
-                        item).data, cert_code_query))
-            }
-        result['proof_of_age_codes'] = \
-            list(map(lambda item: ProofOfAgeCodeSerializer(item).data,
-                     ProofOfAgeCode.objects.all().order_by('display_order')))
-        result['approval_outcome_codes'] = \
-            list(map(lambda item: ApplicationStatusCodeSerializer(item).data,
-                     ApplicationStatusCode.objects.all()))
-        result['reason_removed_codes'] = \
-            list(map(lambda item: RegistriesRemovalReasonSerializer(item).data,
-                     RegistriesRemovalReason.objects.all()))
-        result['province_state_codes'] = \
-            list(map(lambda item: ProvinceStateCodeSerializer(item).data,
-                     ProvinceStateCode.objects.all().order_by('display_order')))
-
-        return Response(result)
+        options, etag, last_modified = get_person_options()
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            # If-Modified-Since is ignored when there is an If-None-Match.
+            not_modified = etag in parse_etags(if_none_match)
+        else:
+            if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+            not_modified = if_modified_since is not None and last_modified <= if_modified_since
+        if not_modified:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(options)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # The browser may keep the options, but has to check that they're still current.
+        response['Cache-Control'] = 'no-cache'
+        return response
 
 
 class PersonListView(RevisionMixin, AuditCreateMixin, ListCreateAPIView):
@@ -246,7 +321,10 @@ class PersonListView(RevisionMixin, AuditCreateMixin, ListCreateAPIView):
     # Allow searching on name fields, names of related companies, etc.
     filter_backends = (restfilters.DjangoFilterBackend,
                        filters.SearchFilter, filters.OrderingFilter)
-    ordering_fields = ('surname', 'registrations__organization__name')
+    staff_ordering_fields = ('surname', 'registrations__organization__name')
+    # The public search isn't joined to registrations, ordering by organization would list a person once for
+    # each of their registrations.
+    public_ordering_fields = ('surname',)
     ordering = ('surname',)
     search_fields = (
         'first_name',
@@ -257,7 +335,7 @@ class PersonListView(RevisionMixin, AuditCreateMixin, ListCreateAPIView):
     )
 
     # fetch related companies and registration applications (prevent duplicate database trips)
-    queryset = Person.objects.filter(expired_date__isnull=True)
+    queryset = Person.unexpired.all()
 
     def get_queryset(self):
         """ Returns Person queryset, removing non-active and unregistered drillers for anonymous users """
@@ -267,20 +345,21 @@ class PersonListView(RevisionMixin, AuditCreateMixin, ListCreateAPIView):
         registrations_qs = Register.objects.all()
         applications_qs = RegistriesApplication.objects.all()
 
+        user_is_staff = self.user_is_staff()
+
         # Search for cities (split list and return all matches)
         # search comes in as a comma-separated querystring param e.g: ?city=Atlin,Lake Windermere,Duncan
         cities = self.request.query_params.get('city', None)
         if cities:
             cities = cities.split(',')
-            qs = qs.filter(registrations__organization__city__in=cities)
+            if user_is_staff:
+                qs = qs.filter(registrations__organization__city__in=cities)
             registrations_qs = registrations_qs.filter(
                 organization__city__in=cities)
 
         activity = self.request.query_params.get('activity', default='DRILL')
         status = self.request.query_params.get('status', None)
 
-        user_is_staff = self.request.user.groups.filter(name=REGISTRIES_VIEWER_ROLE).exists()
-
         if activity:
             if (status == 'P' or not status) and user_is_staff:
                 # We only allow staff to filter on status
@@ -290,9 +369,11 @@ class PersonListView(RevisionMixin, AuditCreateMixin, ListCreateAPIView):
                 registrations_qs = registrations_qs.filter(
                     registries_activity__registries_activity_code=activity)
             else:
-                # For all other searches, we strictly filter on activity.
-                qs = qs.filter(
-                    registrations__registries_activity__registries_activity_code=activity)
+                # For all other searches, we strictly filter on activity (for the public, using the
+                # registry search entries below).
+                if user_is_staff:
+                    qs = qs.filter(
+                        registrations__registries_activity__registries_activity_code=activity)
                 registrations_qs = registrations_qs.filter(
                     registries_activity__registries_activity_code=activity)
 
@@ -318,17 +399,17 @@ class PersonListView(RevisionMixin, AuditCreateMixin, ListCreateAPIView):
                             Q(registrations__applications__removal_date__isnull=True))
         else:
             # User is not logged in
-            # Only show active drillers to non-admin users and public
-            qs = qs.filter(
-                Q(registrations__applications__current_status__code='A',
-                    registrations__registries_activity=activity),
-                Q(registrations__applications__removal_date__isnull=True),
-                Q()
-            )
-
-            registrations_qs = registrations_qs.filter(
-                Q(applications__current_status__code='A'),
-                Q(applications__removal_date__isnull=True))
+            # Only show active drillers to non-admin users and public. These are found with the registry
+            # search entries (see registries.search), rather than by joining registrations, applications
+            # and organizations.
+            entries = RegistrySearch.objects.filter(registries_activity=activity, is_active=True)
+            if cities:
+                entries = entries.filter(city__in=cities)
+            for term in filters.SearchFilter().get_search_terms(self.request):
+                entries = entries.filter(search_text__contains=term.lower())
+            qs = qs.filter(person_guid__in=entries.values('person'))
+
+            registrations_qs = registrations_qs.filter(is_active=True)
 
             applications_qs = applications_qs.filter(
                 current_status='A', removal_date__isnull=True)
@@ -363,8 +444,31 @@ class PersonListView(RevisionMixin, AuditCreateMixin, ListCreateAPIView):
                 Prefetch('registrations', queryset=registrations_qs)
             )
 
+        if not user_is_staff:
+            # The public search doesn't join related records, so there are no duplicates to remove.
+            return qs
         return qs.distinct()
 
+    @property
+    def ordering_fields(self):
+        if getattr(self, 'request', None) is not None and not self.user_is_staff():
+            return self.public_ordering_fields
+        return self.staff_ordering_fields
+
+    def user_is_staff(self):
+        if not hasattr(self, '_user_is_staff'):
+            self._user_is_staff = self.request.user.groups.filter(name=REGISTRIES_VIEWER_ROLE).exists()
+        return self._user_is_staff
+
+    def filter_queryset(self, queryset):
+        if not self.user_is_staff():
+            # The search terms have already been applied to the registry search entries.
+            for backend in self.filter_backends:
+                if backend is not filters.SearchFilter:
+                    queryset = backend().filter_queryset(self.request, queryset, self)
+            return queryset
+        return super().filter_queryset(queryset)
+
     @swagger_auto_schema(responses={200: PersonListSerializer(many=True)})
     def get(self, request, *args, **kwargs):
         # Returns self.list - overridden for schema documentation
@@ -405,24 +509,9 @@ class PersonDetailView(RevisionMixin, AuditUpdateMixin, RetrieveUpdateDestroyAPI
     # pk field has been replaced by person_guid
     lookup_field = "person_guid"
 
-    queryset = Person.objects \
+    queryset = Person.unexpired \
         .all() \
-        .prefetch_related(
-            'notes',
-            'notes__author',
-            'registrations',
-            'registrations__registries_activity',
-            'registrations__organization',
-            'registrations__applications',
-            'registrations__applications__current_status',
-            'registrations__applications__primary_certificate',
-            'registrations__applications__primary_certificate__cert_auth',
-            'registrations__applications__subactivity',
-            'registrations__applications__subactivity__qualification_set',
-            'registrations__applications__subactivity__qualification_set__well_class'
-        ).filter(
-            expired_date__isnull=True
-        ).distinct()
+        .prefetch_related(*person_admin_prefetches())
 
     def get_queryset(self):
         """
@@ -430,8 +519,7 @@ class PersonDetailView(RevisionMixin, AuditUpdateMixin, RetrieveUpdateDestroyAPI
         """
         qs = self.queryset
         if not self.request.user.groups.filter(name=REGISTRIES_VIEWER_ROLE).exists():
-            qs = qs.filter(Q(applications__current_status__code='A'),
-                           Q(applications__removal_date__isnull=True))
+            qs = qs.filter(is_active=True)
         return qs
 
     def destroy(self, request, *args, **kwargs):
@@ -453,35 +541,47 @@ class CitiesListView(ListAPIView):
     get: returns a list of cities with a qualified, registered operator (driller or installer)
     """
     serializer_class = CityListSerializer
-    lookup_field = 'register_guid'
     pagination_class = None
     permission_classes = (DjangoModelPermissionsOrAnonReadOnly,)
-    queryset = Register.objects \
-        .exclude(organization__city__isnull=True) \
-        .exclude(organization__city='') \
-        .select_related(
-            'organization', 'organization__province_state'
-        ) \
-        .distinct('organization__city') \
-        .order_by('organization__city')
+    # The city summaries are maintained by registries.search
+    queryset = RegistryCity.objects.all()
+    # Seconds the lists are cached for (they are rebuilt sooner if a city summary changes).
+    cache_timeout = 60 * 60
 
     def get_queryset(self):
         """
-        Returns only registered operators (i.e. drillers with active registration) to anonymous users
-        if request has a kwarg 'activity' (accepts values 'drill' and 'install'), queryset
-        will filter for that activity
+        Returns only cities with registered operators (i.e. drillers with active registration) to
+        anonymous users if request has a kwarg 'activity' (accepts values 'drill' and 'install'),
+        queryset will filter for that activity
         """
         qs = self.queryset
         if not self.request.user.groups.filter(name=REGISTRIES_VIEWER_ROLE).exists():
-            qs = qs.filter(
-                Q(applications__current_status__code='A'),
-                Q(applications__removal_date__isnull=True))
+            qs = qs.filter(active_count__gt=0)
         if self.kwargs.get('activity') == 'drill':
             qs = qs.filter(registries_activity='DRILL')
         if self.kwargs.get('activity') == 'install':
             qs = qs.filter(registries_activity='PUMP')
         return qs
 
+    def list(self, request, *args, **kwargs):
+        """
+        The lists are cached for the current version of the city summaries, which is shared by every
+        process (see registries.search.cities_version).
+        """
+        is_staff = request.user.groups.filter(name=REGISTRIES_VIEWER_ROLE).exists()
+        key = 'registry-cities:{}:{}:{}'.format(registries.search.cities_version.version(),
+                                                self.kwargs.get('activity'),
+                                                'staff' if is_staff else 'public')
+        cities = cache.get(key)
+        if cities is None:
+            # A city is listed once, even if there is a summary for more than one activity.
+            unique = OrderedDict()
+            for city in self.get_queryset().order_by('city', 'registries_activity'):
+                unique.setdefault(city.city, city)
+            cities = [dict(city) for city in self.get_serializer(unique.values(), many=True).data]
+            cache.set(key, cities, self.cache_timeout)
+        return Response(cities)
+
 
 class RegistrationListView(RevisionMixin, AuditCreateMixin, ListCreateAPIView):
     """
@@ -587,7 +687,7 @@ class ApplicationDetailView(RevisionMixin, AuditUpdateMixin, RetrieveUpdateDestr
     lookup_field = "application_guid"
 
 
-class OrganizationNameListView(ListAPIView):
+class OrganizationNameListView(AutocompleteMixin, ListAPIView):
     """
     Simple list of organizations with only organization names
     """
@@ -600,6 +700,11 @@ class OrganizationNameListView(ListAPIView):
     pagination_class = None
     lookup_field = 'organization_guid'
 
+    # Organizations can be searched with ?search=, otherwise they're all listed.
+    filter_backends = (filters.SearchFilter,)
+    search_fields = ('name',)
+    autocomplete_fields = ('name',)
+
 
 class PersonNoteListView(AuditCreateMixin, ListCreateAPIView):
     """
@@ -745,50 +850,98 @@ class PersonHistory(APIView):
         except Person.DoesNotExist:
             raise Http404("Person not found")
 
-        # query records in history for this model.
-        person_history = [obj for obj in person.history.all().order_by(
-            '-revision__date_created')]
-
-        person_history_diff = generate_history_diff(
-            person_history, 'Person profile')
+        registrations = person.registrations \
+            .select_related('registries_activity') \
+            .prefetch_related(Prefetch('applications',
+                                       queryset=RegistriesApplication.objects.select_related('subactivity')))
+        applications = [app for reg in registrations for app in reg.applications.all()]
+
+        # The versions of the person, their registrations and their applications are fetched in one
+        # query, newest first, along with the other versions in each revision (used to describe foreign
+        # keys, see generate_history_diff)
+        person_type = ContentType.objects.get_for_model(Person)
+        registration_type = ContentType.objects.get_for_model(Register)
+        application_type = ContentType.objects.get_for_model(RegistriesApplication)
+        versions = Version.objects \
+            .filter(Q(content_type=person_type, object_id=str(person.person_guid)) |
+                    Q(content_type=registration_type,
+                      object_id__in=[str(reg.register_guid) for reg in registrations]) |
+                    Q(content_type=application_type,
+                      object_id__in=[str(app.application_guid) for app in applications])) \
+            .select_related('revision') \
+            .prefetch_related('revision__version_set') \
+            .order_by('-revision__date_created', '-pk')
+
+        history = defaultdict(list)
+        for version in versions:
+            history[(version.content_type_id, version.object_id)].append(version)
+
+        history_diff = generate_history_diff(
+            history[(person_type.id, str(person.person_guid))], 'Person profile')
+
+        # generate diffs for version history in each of the individual's registrations and applications
+        for reg in registrations:
+            history_diff += generate_history_diff(
+                history[(registration_type.id, str(reg.register_guid))],
+                reg.registries_activity.description + ' registration')
 
-        registration_history = []
-        registration_history_diff = []
-
-        application_history = []
-        application_history_diff = []
+            for app in reg.applications.all():
+                history_diff += generate_history_diff(
+                    history[(application_type.id, str(app.application_guid))],
+                    app.subactivity.description + ' application')
 
-        # generate diffs for version history in each of the individual's registrations
-        for reg in person.registrations.all():
-            registration_history = [
-                obj for obj in reg.history.all()]
-            registration_history_diff += generate_history_diff(
-                registration_history, reg.registries_activity.description + ' registration')
+        history_diff = sorted(history_diff, key=lambda x: x['date'], reverse=True)
 
-            for app in reg.applications.all():
-                application_history = [
-                    obj for obj in app.history.all()]
-                application_history_diff += generate_history_diff(
-                    application_history, app.subactivity.description + ' application')
+        return Response(history_diff)
 
-        # generate application diffs
 
-        history_diff = sorted(
-            person_history_diff +
-            registration_history_diff +
-            application_history_diff, key=lambda x: x['date'], reverse=True)
+class ListExtracts(APIView):
+    """
+    List registries extracts
 
-        return Response(history_diff)
+    get: list registries extracts (see the export_registries command)
+    """
+    @swagger_auto_schema(auto_schema=None)
+    def get(self, request):
+        host = get_env_variable('S3_HOST')
+        use_secure = int(get_env_variable('S3_USE_SECURE', 1))
+        minioClient = Minio(host,
+                            access_key=get_env_variable('S3_PUBLIC_ACCESS_KEY'),
+                            secret_key=get_env_variable('S3_PUBLIC_SECRET_KEY'),
+                            secure=use_secure)
+        objects = minioClient.list_objects(export_bucket(), prefix=EXPORT_PREFIX)
+        urls = [
+            {
+                'url': 'https://{}/{}/{}'.format(host,
+                                                 quote(document.bucket_name),
+                                                 quote(document.object_name)),
+                'name': document.object_name[len(EXPORT_PREFIX):],
+                'size': document.size,
+                'last_modified': document.last_modified,
+                'description': self.create_description(document.object_name)
+            } for document in objects if not document.is_dir
+        ]
+        return Response(urls)
+
+    def create_description(self, name):
+        extension = name[name.rfind('.')+1:]
+        if extension == 'zip':
+            return 'ZIP, CSV'
+        elif extension == 'xlsx':
+            return 'XLSX'
+        else:
+            return None
 
 
-class PersonNameSearch(ListAPIView):
+class PersonNameSearch(AutocompleteMixin, ListAPIView):
     """Search for a person in the Register"""
 
     permission_classes = (DjangoModelPermissionsOrAnonReadOnly,)
     serializer_class = PersonNameSerializer
-    queryset = Person.objects.all()
+    queryset = Person.objects.all().prefetch_related('registrations')
     pagination_class = None
     lookup_field = 'person_guid'
+    autocomplete_fields = ('surname', 'first_name')
 
     filter_backends = (restfilters.DjangoFilterBackend,
                        filters.SearchFilter)
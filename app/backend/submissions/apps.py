@@ -17,3 +17,8 @@ from django.apps import AppConfig
 
 class SubmissionsConfig(AppConfig):
     name = 'submissions'
+
+    def ready(self):
+        from gwells.codes import code_tables
+        from submissions.codes import OPTIONS_CODE_TABLES
+        code_tables.register(*OPTIONS_CODE_TABLES)
@@ -0,0 +1,41 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+from gwells.models import ProvinceStateCode
+from gwells.models.lithology import (
+    LithologyColourCode, LithologyHardnessCode,
+    LithologyMaterialCode, LithologyMoistureCode, LithologyDescriptionCode)
+from submissions.models import WellActivityCode
+from wells.models import (
+    CasingCode, CasingMaterialCode, CoordinateAcquisitionCode, DecommissionMaterialCode, DecommissionMethodCode,
+    DevelopmentMethodCode, DrillingMethodCode, FilterPackMaterialCode, FilterPackMaterialSizeCode,
+    GroundElevationMethodCode, IntendedWaterUseCode, LandDistrictCode, LinerMaterialCode, ObsWellStatusCode,
+    ScreenAssemblyTypeCode, ScreenBottomCode, ScreenIntakeMethodCode, ScreenMaterialCode, ScreenOpeningCode,
+    ScreenTypeCode, SurfaceSealMaterialCode, SurfaceSealMethodCode, SurficialMaterialCode,
+    WaterQualityCharacteristic, WaterQualityColour, WellClassCode, WellPublicationStatusCode, WellStatusCode,
+    WellSubclassCode, YieldEstimationMethodCode)
+
+
+# Code tables included in the submissions options. The options are cached for each version of the code
+# tables, so all of them are registered with the code table cache.
+OPTIONS_CODE_TABLES = (
+    ProvinceStateCode, WellActivityCode, WellClassCode, WellSubclassCode, IntendedWaterUseCode, CasingCode,
+    CasingMaterialCode, DecommissionMaterialCode, DecommissionMethodCode, FilterPackMaterialCode,
+    FilterPackMaterialSizeCode, LandDistrictCode, LinerMaterialCode, GroundElevationMethodCode,
+    DrillingMethodCode, SurfaceSealMethodCode, SurfaceSealMaterialCode, SurficialMaterialCode,
+    ScreenIntakeMethodCode, ScreenTypeCode, ScreenMaterialCode, ScreenOpeningCode, ScreenBottomCode,
+    ScreenAssemblyTypeCode, DevelopmentMethodCode, YieldEstimationMethodCode, WaterQualityCharacteristic,
+    WaterQualityColour, WellStatusCode, WellPublicationStatusCode, CoordinateAcquisitionCode,
+    ObsWellStatusCode, LithologyHardnessCode, LithologyColourCode, LithologyMaterialCode,
+    LithologyMoistureCode, LithologyDescriptionCode,
+)
@@ -0,0 +1,34 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+from django_filters import rest_framework as filters
+
+from wells.models import ActivitySubmission
+
+
+class SubmissionListFilter(filters.FilterSet):
+    well = filters.NumberFilter(field_name='well')
+    well_activity_type = filters.CharFilter(field_name='well_activity_type')
+    person_responsible = filters.UUIDFilter(field_name='person_responsible')
+    company_of_person_responsible = filters.UUIDFilter(field_name='company_of_person_responsible')
+    create_date = filters.DateFromToRangeFilter(label='Create date')
+
+    class Meta:
+        model = ActivitySubmission
+        fields = [
+            'well',
+            'well_activity_type',
+            'person_responsible',
+            'company_of_person_responsible',
+            'create_date',
+        ]
@@ -16,24 +16,28 @@ import uuid
 
 from django.contrib.gis.db import models
 from django.core.validators import MinValueValidator
+from gwells.codes import code_tables
 from gwells.models import AuditModel
 
 class WellActivityCodeTypeManager(models.Manager):
+    """
+    Returns activity codes from the in memory code tables, these are shared, and must not be modified.
+    """
 
     def construction(self):
-        return self.get_queryset().get(code='CON')
+        return code_tables.get(self.model, 'CON')
 
     def legacy(self):
-        return self.get_queryset().get(code='LEGACY')
+        return code_tables.get(self.model, 'LEGACY')
 
     def decommission(self):
-        return self.get_queryset().get(code='DEC')
+        return code_tables.get(self.model, 'DEC')
 
     def alteration(self):
-        return self.get_queryset().get(code='ALT')
+        return code_tables.get(self.model, 'ALT')
 
     def staff_edit(self):
-        return self.get_queryset().get(code='STAFF_EDIT')
+        return code_tables.get(self.model, 'STAFF_EDIT')
 
 
 class WellActivityCode(AuditModel):
@@ -15,17 +15,20 @@ import logging
 
 from django.db import transaction
 from django.db.models import OneToOneField
+from django.utils import timezone
 from rest_framework import serializers
 
+from gwells.codes import code_tables
 from gwells.models import ProvinceStateCode
-from gwells.serializers import AuditModelSerializer
+from gwells.serializers import AuditModelSerializer, CodeTableRelatedField
 import wells.stack
+import wells.stack_jobs
 
 from gwells.models.lithology import (
     LithologyColourCode, LithologyHardnessCode,
     LithologyMaterialCode, LithologyMoistureCode, LithologyDescriptionCode)
 
-from wells.models import Well, ActivitySubmission, WellActivityCode
+from wells.models import Well, ActivitySubmission, WellActivityCode, StackJob
 from wells.serializers import (
     CasingSerializer,
     DecommissionDescriptionSerializer,
@@ -75,6 +78,25 @@ from wells.models import (
 logger = logging.getLogger(__name__)
 
 
+class StackJobSerializer(serializers.ModelSerializer):
+    """ Serializes the status of a queued stack job """
+
+    well = serializers.ReadOnlyField(source='submission.well_id')
+
+    class Meta:
+        model = StackJob
+        fields = (
+            'stack_job_id',
+            'submission',
+            'well',
+            'status',
+            'attempts',
+            'error',
+            'create_date',
+            'update_date',
+        )
+
+
 class WellSubmissionListSerializer(serializers.ModelSerializer):
     """ Class used for listing well submissions.
     """
@@ -92,9 +114,51 @@ class WellSubmissionListSerializer(serializers.ModelSerializer):
         model = ActivitySubmission
 
 
+class WellSubmissionSummarySerializer(serializers.ModelSerializer):
+    """ Class used for listing well submissions without their related records.
+    Expects the queryset to be annotated with the number of each type of related record (see
+    submissions.views.get_submission_summary_queryset).
+    """
+
+    well_activity_type = serializers.ReadOnlyField(source='well_activity_type_id')
+    person_responsible_name = serializers.ReadOnlyField(source='person_responsible.name')
+    company_of_person_responsible_name = serializers.ReadOnlyField(
+        source='company_of_person_responsible.name')
+    casing_count = serializers.IntegerField(read_only=True)
+    screen_count = serializers.IntegerField(read_only=True)
+    linerperforation_count = serializers.IntegerField(read_only=True)
+    lithologydescription_count = serializers.IntegerField(read_only=True)
+    decommission_description_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = ActivitySubmission
+        fields = (
+            'filing_number',
+            'well',
+            'well_activity_type',
+            'work_start_date',
+            'work_end_date',
+            'owner_full_name',
+            'person_responsible',
+            'person_responsible_name',
+            'company_of_person_responsible',
+            'company_of_person_responsible_name',
+            'create_user',
+            'create_date',
+            'casing_count',
+            'screen_count',
+            'linerperforation_count',
+            'lithologydescription_count',
+            'decommission_description_count',
+        )
+
+
 class WellSubmissionSerializerBase(serializers.ModelSerializer):
     """ Bass class for well submission serialisation. """
 
+    # Codes are validated against the in memory code tables.
+    serializer_related_field = CodeTableRelatedField
+
     def get_foreign_key_sets(self):
         raise NotImplementedError()  # Implement in base class!
 
@@ -114,7 +178,13 @@ class WellSubmissionSerializerBase(serializers.ModelSerializer):
         # If the yield_estimation_rate is specified, we default to USGPM
         if validated_data.get('yield_estimation_rate', None) and \
                 not validated_data.get('well_yield_unit', None):
-            validated_data['well_yield_unit'] = WellYieldUnitCode.objects.get(well_yield_unit_code='USGPM')
+            validated_data['well_yield_unit'] = code_tables.get(WellYieldUnitCode, 'USGPM')
+
+        well = validated_data.get('well')
+        if well and self.context.get('stack_async'):
+            # By the time the stack worker gets to it, other submissions may have been queued for the well,
+            # so the information of a legacy well is recorded now.
+            wells.stack.StackWells().create_legacy_submission_if_required(well)
 
         instance = super().create(validated_data)
         # Create foreign key records.
@@ -124,10 +194,22 @@ class WellSubmissionSerializerBase(serializers.ModelSerializer):
                 field = model._meta.get_field(key)
                 foreign_class = foreign_keys[key]
                 if field.one_to_many:
-                    for data in value:
-                        foreign_class.objects.create(activity_submission=instance, **data)
+                    # bulk_create doesn't call save(), so the audit dates have to be populated here.
+                    now = timezone.now()
+                    foreign_class.objects.bulk_create([
+                        foreign_class(activity_submission=instance, create_date=now, update_date=now, **data)
+                        for data in value])
                 else:
                     raise 'UNEXPECTED FIELD! {}'.format(field)
+        if self.context.get('stack_async'):
+            # The well record is updated by the stack worker.
+            request = self.context.get('request')
+            instance.stack_job = wells.stack_jobs.enqueue_stack(
+                instance, request.user.get_username() if request else None)
+            return instance
+        if self.context.get('defer_stacking'):
+            # The caller is responsible for updating the well record (e.g. once for a batch of submissions).
+            return instance
         # Update the well record.
         stacker = wells.stack.StackWells()
         stacker.process(instance.filing_number)
@@ -135,6 +217,13 @@ class WellSubmissionSerializerBase(serializers.ModelSerializer):
         instance.refresh_from_db()
         return instance
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        stack_job = getattr(instance, 'stack_job', None)
+        if stack_job:
+            data['stack_job'] = StackJobSerializer(stack_job).data
+        return data
+
 
 class WellSubmissionStackerSerializer(WellSubmissionSerializerBase):
     """ Class with no validation, and all possible fields, used by stacker to serialize. """
@@ -219,7 +308,7 @@ class WellConstructionSubmissionSerializer(WellSubmissionSerializerBase):
     def create(self, validated_data):
         # Whenever we create a Construction record, we default to H (gps) for the source.
         if 'coordinate_acquisition_code' not in validated_data:
-            validated_data['coordinate_acquisition_code'] = CoordinateAcquisitionCode.objects.get(code='H')
+            validated_data['coordinate_acquisition_code'] = code_tables.get(CoordinateAcquisitionCode, 'H')
         return super().create(validated_data)
 
     def get_foreign_key_sets(self):
@@ -1,11 +1,15 @@
 from django.urls import reverse
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
 
 from rest_framework.test import APITestCase
 from rest_framework import status
 
 from gwells.roles import roles_to_groups, WELLS_EDIT_ROLE, WELLS_VIEWER_ROLE
+from submissions.models import WellActivityCode
+from wells.models import ActivitySubmission, Casing, StackJob, Well, WellStatusCode
+from wells.stack_jobs import run_stack_jobs
 from submissions.serializers import (WellSubmissionListSerializer, WellConstructionSubmissionSerializer,
                                      WellAlterationSubmissionSerializer, WellDecommissionSubmissionSerializer)
 
@@ -87,6 +91,26 @@ class TestPermissionsSubmissionRights(APITestCase):
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def test_construction_submission_casings_created(self):
+        # The casings of a submission are inserted together, and given their audit dates.
+        data = {
+            'owner_full_name': 'molly',
+            'owner_mailing_address': 'somewhere',
+            'owner_city': 'somewhere',
+            'owner_province_state': 'BC',
+            'casing_set': [
+                {'start': 0, 'end': 10, 'diameter': 6},
+                {'start': 10, 'end': 20, 'diameter': 6},
+            ]
+        }
+        response = self.client.post(reverse('CON'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        casings = Casing.objects.filter(activity_submission_id=response.data['filing_number']).order_by('start')
+        self.assertEqual([(casing.start, casing.end) for casing in casings], [(0, 10), (10, 20)])
+        for casing in casings:
+            self.assertIsNotNone(casing.create_date)
+            self.assertIsNotNone(casing.update_date)
+
     def test_edit_rights_attempts_alteration_submition(self):
         url = reverse('ALT')
         # As a user with edit rights, I should be able to make an alteration submission.
@@ -112,3 +136,249 @@ class TestPermissionsSubmissionRights(APITestCase):
         }
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+@override_settings(ENABLE_ASYNC_STACKING=True)
+class TestAsyncStacking(APITestCase):
+
+    fixtures = ['gwells-codetables.json', 'wellsearch-codetables.json']
+
+    def setUp(self):
+        user, created = User.objects.get_or_create(username='edit_rights')
+        roles_to_groups(user, [WELLS_EDIT_ROLE, ])
+        self.client.force_authenticate(user)
+
+    def test_construction_submission_queued(self):
+        # The submission is created, but the well is only stacked once the worker has run.
+        data = {
+            'owner_full_name': 'molly',
+            'owner_mailing_address': 'somewhere',
+            'owner_city': 'somewhere',
+            'owner_province_state': 'BC',
+        }
+        response = self.client.post(reverse('CON'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        stack_job = response.data['stack_job']
+        self.assertEqual(stack_job['status'], StackJob.PENDING)
+        submission = ActivitySubmission.objects.get(filing_number=response.data['filing_number'])
+        self.assertIsNone(submission.well)
+
+        # Run the worker in process.
+        self.assertEqual(run_stack_jobs(), 1)
+
+        submission.refresh_from_db()
+        self.assertEqual(submission.well.owner_full_name, 'molly')
+        url = reverse('submissions-stack-job', kwargs={'stack_job_id': stack_job['stack_job_id']})
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], StackJob.DONE)
+        self.assertEqual(response.data['well'], submission.well.well_tag_number)
+        self.assertEqual(response.data['attempts'], 1)
+
+    def test_queued_submissions_for_legacy_well(self):
+        # Two submissions are queued for a legacy well before the worker runs, the well's casings are kept.
+        well = Well.objects.create(owner_full_name='Bob', owner_province_state_id='BC')
+        Casing.objects.create(start=0, end=10, well=well)
+        Casing.objects.create(start=10, end=20, well=well)
+        for owner_full_name in ('molly', 'holly'):
+            data = {
+                'well': well.well_tag_number,
+                'owner_full_name': owner_full_name,
+                'owner_mailing_address': 'somewhere',
+                'owner_city': 'somewhere',
+                'owner_province_state': 'BC',
+            }
+            response = self.client.post(reverse('ALT'), data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        legacy = ActivitySubmission.objects.get(well=well, well_activity_type=WellActivityCode.types.legacy())
+        self.assertEqual(legacy.casing_set.count(), 2)
+
+        self.assertEqual(run_stack_jobs(), 2)
+
+        well.refresh_from_db()
+        self.assertEqual(well.owner_full_name, 'holly')
+        self.assertEqual(well.casing_set.count(), 2)
+        self.assertEqual(ActivitySubmission.objects.filter(well=well).count(), 3)
+
+
+class TestSubmissionsOptions(APITestCase):
+
+    fixtures = ['gwells-codetables.json', 'wellsearch-codetables.json']
+
+    def setUp(self):
+        cache.clear()
+
+    def test_options_not_modified(self):
+        url = reverse('submissions-options')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        # The options are cached, so asking again doesn't query the code tables.
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_options_etag_same_in_every_process(self):
+        # Another process (with nothing cached) gives the same options the same ETag.
+        url = reverse('submissions-options')
+        etag = self.client.get(url)['ETag']
+        cache.clear()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_options_invalidated_by_code_table_change(self):
+        url = reverse('submissions-options')
+        etag = self.client.get(url)['ETag']
+        WellStatusCode.objects.create(well_status_code='TEST', description='Test', display_order=99)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('TEST', [code['well_status_code'] for code in response.data['well_status_codes']])
+
+
+class TestSubmissionBatch(APITestCase):
+
+    fixtures = ['gwells-codetables.json', 'wellsearch-codetables.json']
+
+    def setUp(self):
+        user, created = User.objects.get_or_create(username='edit_rights')
+        roles_to_groups(user, [WELLS_EDIT_ROLE, ])
+        self.client.force_authenticate(user)
+
+    def test_batch_partial_failure(self):
+        data = [
+            {
+                'well_activity_type': 'CON',
+                'owner_full_name': 'molly',
+                'owner_mailing_address': 'somewhere',
+                'owner_city': 'somewhere',
+                'owner_province_state': 'BC',
+            },
+            {
+                'well_activity_type': 'NOPE',
+                'owner_full_name': 'polly',
+            },
+            {
+                'well_activity_type': 'CON',
+                'owner_full_name': 'dolly',
+                'owner_mailing_address': 'somewhere',
+                'owner_city': 'somewhere',
+                'owner_province_state': 'NOPE',
+            },
+            {
+                'well_activity_type': 'CON',
+                'owner_full_name': 'holly',
+                'owner_mailing_address': 'somewhere',
+                'owner_city': 'somewhere',
+                'owner_province_state': 'BC',
+            },
+        ]
+        response = self.client.post(reverse('submissions-batch'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([result['status'] for result in response.data], [201, 400, 400, 201])
+        self.assertIn('owner_province_state', response.data[2]['errors'])
+        for result in (response.data[0], response.data[3]):
+            submission = ActivitySubmission.objects.get(filing_number=result['filing_number'])
+            self.assertEqual(submission.well_id, result['well'])
+            self.assertIsNotNone(submission.well)
+        self.assertEqual(ActivitySubmission.objects.count(), 2)
+
+    def test_batch_for_legacy_well(self):
+        # A well that was never stacked keeps its information (including casings) when a batch of
+        # submissions is stacked onto it.
+        well = Well.objects.create(owner_full_name='Bob', owner_province_state_id='BC')
+        Casing.objects.create(start=0, end=10, well=well)
+        Casing.objects.create(start=10, end=20, well=well)
+        data = [
+            {
+                'well_activity_type': 'ALT',
+                'well': well.well_tag_number,
+                'owner_full_name': 'molly',
+                'owner_mailing_address': 'somewhere',
+                'owner_city': 'somewhere',
+                'owner_province_state': 'BC',
+            },
+            {
+                'well_activity_type': 'ALT',
+                'well': well.well_tag_number,
+                'owner_full_name': 'holly',
+                'owner_mailing_address': 'somewhere',
+                'owner_city': 'somewhere',
+                'owner_province_state': 'BC',
+            },
+        ]
+        response = self.client.post(reverse('submissions-batch'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        submissions = ActivitySubmission.objects.filter(well=well)
+        self.assertEqual(submissions.count(), 3)
+        legacy = submissions.get(well_activity_type=WellActivityCode.types.legacy())
+        self.assertEqual(legacy.casing_set.count(), 2)
+        well.refresh_from_db()
+        self.assertEqual(well.owner_full_name, 'holly')
+        self.assertEqual(well.casing_set.count(), 2)
+
+    def test_batch_not_a_list(self):
+        response = self.client.post(reverse('submissions-batch'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_empty(self):
+        response = self.client.post(reverse('submissions-batch'), [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ActivitySubmission.objects.count(), 0)
+
+
+class TestSubmissionListSummary(APITestCase):
+
+    fixtures = ['gwells-codetables.json', 'wellsearch-codetables.json']
+
+    def setUp(self):
+        user, created = User.objects.get_or_create(username='edit_rights')
+        roles_to_groups(user, [WELLS_EDIT_ROLE, ])
+        self.client.force_authenticate(user)
+
+    def test_summary_has_child_counts(self):
+        submission = ActivitySubmission.objects.create(
+            owner_full_name='molly',
+            well_activity_type=WellActivityCode.types.construction())
+        Casing.objects.create(activity_submission=submission, start=0, end=10)
+        Casing.objects.create(activity_submission=submission, start=10, end=20)
+        response = self.client.get(reverse('submissions-list'), {'summary': 'true'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = response.data['results'][0]
+        self.assertEqual(result['filing_number'], submission.filing_number)
+        self.assertEqual(result['casing_count'], 2)
+        self.assertEqual(result['screen_count'], 0)
+        self.assertNotIn('casing_set', result)
+
+
+class TestSubmissionListFilter(APITestCase):
+
+    fixtures = ['gwells-codetables.json', 'wellsearch-codetables.json']
+
+    def setUp(self):
+        user, created = User.objects.get_or_create(username='edit_rights')
+        roles_to_groups(user, [WELLS_EDIT_ROLE, ])
+        self.client.force_authenticate(user)
+        self.submissions = [
+            ActivitySubmission.objects.create(well_activity_type=WellActivityCode.types.construction()),
+            ActivitySubmission.objects.create(well_activity_type=WellActivityCode.types.alteration()),
+            ActivitySubmission.objects.create(well_activity_type=WellActivityCode.types.construction()),
+        ]
+
+    def test_filter_by_activity_type(self):
+        response = self.client.get(reverse('submissions-list'), {'well_activity_type': 'CON'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['filing_number'] for result in response.data['results']],
+                         [self.submissions[0].filing_number, self.submissions[2].filing_number])
+
+    def test_keyset_pagination(self):
+        url = reverse('submissions-list')
+        response = self.client.get(url, {'pagination': 'keyset', 'limit': 2, 'summary': 'true'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['filing_number'] for result in response.data['results']],
+                         [submission.filing_number for submission in self.submissions[:2]])
+        response = self.client.get(response.data['next'], format='json')
+        self.assertEqual([result['filing_number'] for result in response.data['results']],
+                         [self.submissions[2].filing_number])
+        self.assertIsNone(response.data['next'])
@@ -17,14 +17,15 @@ from django.views.decorators.cache import never_cache
 from submissions.views import (SubmissionsOptions, SubmissionListAPIView, SubmissionConstructionAPIView,
                                SubmissionAlterationAPIView, SubmissionDecommissionAPIView,
                                SubmissionsHomeView, SubmissionGetAPIView, SubmissionStaffEditAPIView,
-                               PreSignedDocumentKey,)
+                               PreSignedDocumentKey, StackJobGetAPIView,
+                               SubmissionBatchAPIView,)
 
 
 urlpatterns = [
 
     # Submissions form options
     url(r'^api/v1/submissions/options/$',
-        never_cache(SubmissionsOptions.as_view()), name='submissions-options'),
+        SubmissionsOptions.as_view(), name='submissions-options'),
 
     # Submissions list
     url(r'^api/v1/submissions/$',
@@ -44,6 +45,12 @@ urlpatterns = [
     # Edit submission
     url(r'^api/v1/submissions/staff_edit',
         never_cache(SubmissionStaffEditAPIView().as_view()), name='STAFF_EDIT'),
+    # Batch of submissions
+    url(r'^api/v1/submissions/batch$',
+        never_cache(SubmissionBatchAPIView.as_view()), name='submissions-batch'),
+    # Stack job status
+    url(r'^api/v1/submissions/stack_jobs/(?P<stack_job_id>[0-9]+)$',
+        never_cache(StackJobGetAPIView.as_view()), name='submissions-stack-job'),
 
     # Document Uploading (submission records)
     url(r'^api/v1/submissions/(?P<submission_id>[0-9]+)/presigned_put_url$',
@@ -11,19 +11,34 @@
     See the License for the specific language governing permissions and
     limitations under the License.
 """
-
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+
+from django_filters import rest_framework as restfilters
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from posixpath import join as urljoin
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.views.generic import TemplateView
 from django.urls import reverse
+from django.utils.http import parse_etags, quote_etag
 from rest_framework.generics import ListAPIView, ListCreateAPIView, RetrieveAPIView
 from rest_framework.views import APIView
 
+from gwells.codes import code_tables
 from gwells.documents import MinioClient
 from gwells.urls import app_root
-from gwells.pagination import APILimitOffsetPagination
+from gwells.pagination import APIKeysetPagination, APILimitOffsetPagination
 from wells.permissions import WellsEditPermissions
 from gwells.models import ProvinceStateCode
 from gwells.models.lithology import (
@@ -33,9 +48,12 @@ from gwells.serializers import ProvinceStateCodeSerializer
 from gwells.settings.base import get_env_variable
 from wells.models import (
     ActivitySubmission,
+    StackJob,
+    Casing,
     CasingCode,
     CasingMaterialCode,
     CoordinateAcquisitionCode,
+    DecommissionDescription,
     DecommissionMaterialCode,
     DecommissionMethodCode,
     DevelopmentMethodCode,
@@ -46,7 +64,10 @@ from wells.models import (
     IntendedWaterUseCode,
     LandDistrictCode,
     LinerMaterialCode,
+    LinerPerforation,
+    LithologyDescription,
     ObsWellStatusCode,
+    Screen,
     ScreenIntakeMethodCode,
     SurfaceSealMaterialCode,
     SurfaceSealMethodCode,
@@ -64,7 +85,9 @@ from wells.models import (
     WellStatusCode,
     WellPublicationStatusCode,
     YieldEstimationMethodCode,)
+from submissions.filters import SubmissionListFilter
 from submissions.models import WellActivityCode
+from wells.stack import StackWells
 from wells.serializers import (
     CasingCodeSerializer,
     CasingMaterialSerializer
@@ -102,6 +125,7 @@ from submissions.serializers import (
     WellAlterationSubmissionSerializer,
     WellDecommissionSubmissionSerializer,
     WellSubmissionListSerializer,
+    WellSubmissionSummarySerializer,
     WellActivityCodeSerializer,
     WellClassCodeSerializer,
     WellStatusCodeSerializer,
@@ -109,8 +133,11 @@ from submissions.serializers import (
     WellSubclassCodeSerializer,
     YieldEstimationMethodCodeSerializer,
     WellStaffEditSubmissionSerializer,
+    StackJobSerializer,
 )
 
+logger = logging.getLogger(__name__)
+
 
 def get_submission_queryset(qs):
     return qs.select_related(
@@ -168,10 +195,39 @@ class SubmissionGetAPIView(RetrieveAPIView):
         return serializer_class(*args, **kwargs)
 
 
+def child_count(model):
+    """ Subquery counting the records of model that belong to each submission """
+    return Coalesce(Subquery(
+        model.objects
+        .filter(activity_submission=OuterRef('pk'))
+        .order_by()
+        .values('activity_submission')
+        .annotate(count=Count('*'))
+        .values('count'),
+        output_field=IntegerField()), 0)
+
+
+def get_submission_summary_queryset(qs):
+    return qs.select_related(
+                "person_responsible",
+                "company_of_person_responsible",
+            ) \
+            .annotate(
+                casing_count=child_count(Casing),
+                screen_count=child_count(Screen),
+                linerperforation_count=child_count(LinerPerforation),
+                lithologydescription_count=child_count(LithologyDescription),
+                decommission_description_count=child_count(DecommissionDescription),
+            ) \
+            .order_by("filing_number")
+
+
 class SubmissionListAPIView(ListAPIView):
     """List and create submissions
 
-    get: returns a list of well activity submissions
+    get: returns a list of well activity submissions. With ?summary=true, only the submission
+    header fields are returned along with the number of each type of related record (the full submission
+    is available from the submission endpoint).
     post: adds a new submission
     """
 
@@ -181,24 +237,65 @@ class SubmissionListAPIView(ListAPIView):
     pagination_class = APILimitOffsetPagination
     serializer_class = WellSubmissionListSerializer
 
+    filter_backends = (restfilters.DjangoFilterBackend,)
+    filterset_class = SubmissionListFilter
+
+    def is_summary(self):
+        return self.request.query_params.get('summary') == 'true'
+
+    @property
+    def paginator(self):
+        """
+        Pages are by limit/offset, unless keyset pagination is asked for with ?pagination=keyset (in
+        which case the following pages are given by a cursor)
+        """
+        if not hasattr(self, '_paginator'):
+            if (self.request.query_params.get('pagination') == 'keyset' or
+                    APIKeysetPagination.cursor_query_param in self.request.query_params):
+                self._paginator = APIKeysetPagination()
+                self._paginator.ordering = 'filing_number'
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_queryset(self):
+        if self.is_summary():
+            return get_submission_summary_queryset(self.queryset)
         return get_submission_queryset(self.queryset)
 
+    def get_serializer_class(self):
+        if self.is_summary():
+            return WellSubmissionSummarySerializer
+        return WellSubmissionListSerializer
+
     def list(self, request):
         """ List activity submissions with pagination """
         queryset = self.get_queryset()
         filtered_queryset = self.filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
 
         page = self.paginate_queryset(filtered_queryset)
         if page is not None:
-            serializer = WellSubmissionListSerializer(page, many=True)
+            serializer = serializer_class(page, many=True)
             return self.get_paginated_response(serializer.data)
 
-        serializer = WellSubmissionListSerializer(filtered_queryset, many=True)
+        serializer = serializer_class(filtered_queryset, many=True)
         return Response(serializer.data)
 
 
-class SubmissionConstructionAPIView(ListCreateAPIView):
+class StackModeMixin():
+    """
+    Tells submission serializers whether to stack the well during the request, or to queue a stack job
+    (see ENABLE_ASYNC_STACKING).
+    """
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['stack_async'] = settings.ENABLE_ASYNC_STACKING
+        return context
+
+
+class SubmissionConstructionAPIView(StackModeMixin, ListCreateAPIView):
     """Create a construction submission
 
     """
@@ -212,7 +309,7 @@ class SubmissionConstructionAPIView(ListCreateAPIView):
             .filter(well_activity_type=WellActivityCode.types.construction())
 
 
-class SubmissionAlterationAPIView(ListCreateAPIView):
+class SubmissionAlterationAPIView(StackModeMixin, ListCreateAPIView):
     """Create an alteration submission
 
     """
@@ -226,7 +323,7 @@ class SubmissionAlterationAPIView(ListCreateAPIView):
             .filter(well_activity_type=WellActivityCode.types.alteration())
 
 
-class SubmissionDecommissionAPIView(ListCreateAPIView):
+class SubmissionDecommissionAPIView(StackModeMixin, ListCreateAPIView):
     """Create an decommission submission
 
     """
@@ -240,7 +337,7 @@ class SubmissionDecommissionAPIView(ListCreateAPIView):
             .filter(well_activity_type=WellActivityCode.types.decommission())
 
 
-class SubmissionStaffEditAPIView(ListCreateAPIView):
+class SubmissionStaffEditAPIView(StackModeMixin, ListCreateAPIView):
     """ Create a staff edit submission
     TODO: Implement this class fully
     """
@@ -254,124 +351,258 @@ class SubmissionStaffEditAPIView(ListCreateAPIView):
             .filter(well_activity_type=WellActivityCode.types.staff_edit())
 
 
+class SubmissionBatchAPIView(APIView):
+    """Create a batch of submissions
+
+    post: validates and creates a list of construction, alteration and decommission submissions (each
+    identified by its well_activity_type), returning a result for each one. Submissions that fail don't
+    prevent the others from being created.
+    """
+
+    permission_classes = (WellsEditPermissions,)
+
+    MAX_BATCH_SIZE = 100
+
+    def get_serializer_class(self, item):
+        activity = item.get('well_activity_type') if isinstance(item, dict) else None
+        return {
+            WellActivityCode.types.construction().code: WellConstructionSubmissionSerializer,
+            WellActivityCode.types.alteration().code: WellAlterationSubmissionSerializer,
+            WellActivityCode.types.decommission().code: WellDecommissionSubmissionSerializer,
+        }.get(activity)
+
+    def post(self, request):
+        if not isinstance(request.data, list):
+            return Response({'detail': 'Expected a list of submissions.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not request.data:
+            return Response({'detail': 'Expected at least one submission.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.MAX_BATCH_SIZE:
+            return Response({'detail': 'A batch may have at most {} submissions.'.format(self.MAX_BATCH_SIZE)},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        stack_async = settings.ENABLE_ASYNC_STACKING
+        context = {'request': request, 'format': self.format_kwarg, 'view': self,
+                   'stack_async': stack_async, 'defer_stacking': True}
+        results = [None] * len(request.data)
+
+        # Validate every submission, and group the valid ones by well.
+        groups = OrderedDict()
+        for index, item in enumerate(request.data):
+            serializer_class = self.get_serializer_class(item)
+            if serializer_class is None:
+                results[index] = {'status': status.HTTP_400_BAD_REQUEST,
+                                  'errors': {'well_activity_type': ['Must be one of CON, ALT or DEC.']}}
+                continue
+            serializer = serializer_class(data=item, context=context)
+            if not serializer.is_valid():
+                results[index] = {'status': status.HTTP_400_BAD_REQUEST, 'errors': serializer.errors}
+                continue
+            well = serializer.validated_data.get('well')
+            # Each submission without a well creates a new one.
+            key = well.well_tag_number if well else (None, index)
+            groups.setdefault(key, []).append((index, serializer))
+
+        # Create the submissions for each well, and stack the well once.
+        stacker = StackWells()
+        for items in groups.values():
+            try:
+                with transaction.atomic():
+                    well = items[0][1].validated_data.get('well')
+                    if well:
+                        # The well is only stacked once its submissions have been created, by which time
+                        # the information of a legacy well would no longer be recorded as a submission.
+                        stacker.create_legacy_submission_if_required(well)
+                    instances = [(index, serializer.save()) for index, serializer in items]
+                    if not stack_async:
+                        stacker.process(instances[-1][1].filing_number)
+            except ValidationError as error:
+                # None of the submissions for this well are created.
+                for index, serializer in items:
+                    results[index] = {'status': status.HTTP_400_BAD_REQUEST, 'errors': error.detail}
+                continue
+            except Exception:
+                logger.exception('batch submission failed')
+                for index, serializer in items:
+                    results[index] = {'status': status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                      'errors': 'Unable to create submission.'}
+                continue
+            for index, instance in instances:
+                instance.refresh_from_db()
+                result = {'status': status.HTTP_201_CREATED, 'filing_number': instance.filing_number,
+                          'well': instance.well_id}
+                stack_job = getattr(instance, 'stack_job', None)
+                if stack_job:
+                    result['stack_job'] = stack_job.stack_job_id
+                results[index] = result
+
+        created = all(result['status'] == status.HTTP_201_CREATED for result in results)
+        return Response(results, status=status.HTTP_201_CREATED if created else status.HTTP_207_MULTI_STATUS)
+
+
+class StackJobGetAPIView(RetrieveAPIView):
+    """Get the status of a queued stack job
+
+    get: returns the status of the job stacking a submission onto its well
+    """
+
+    permission_classes = (WellsEditPermissions,)
+    serializer_class = StackJobSerializer
+    queryset = StackJob.objects.select_related('submission')
+    lookup_field = 'stack_job_id'
+
+
+def build_submissions_options():
+    """ Query and serialize the options required for submitting activity report forms """
+    options = {}
+
+    province_codes = ProvinceStateCodeSerializer(
+        instance=ProvinceStateCode.objects.all(), many=True)
+    activity_codes = WellActivityCodeSerializer(
+        instance=WellActivityCode.objects.all(), many=True)
+    well_class_codes = WellClassCodeSerializer(
+        instance=WellClassCode.objects.prefetch_related("wellsubclasscode_set"), many=True)
+    intended_water_use_codes = IntendedWaterUseCodeSerializer(
+        instance=IntendedWaterUseCode.objects.all(), many=True)
+    casing_codes = CasingCodeSerializer(
+        instance=CasingCode.objects.all(), many=True)
+    casing_material = CasingMaterialSerializer(
+        instance=CasingMaterialCode.objects.all(), many=True)
+    decommission_materials = DecommissionMaterialCodeSerializer(
+        instance=DecommissionMaterialCode.objects.all(), many=True)
+    decommission_methods = DecommissionMethodCodeSerializer(
+        instance=DecommissionMethodCode.objects.all(), many=True)
+    filter_pack_material = FilterPackMaterialCodeSerializer(
+        instance=FilterPackMaterialCode.objects.all(), many=True)
+    filter_pack_material_size = FilterPackMaterialSizeCodeSerializer(
+        instance=FilterPackMaterialSizeCode.objects.all(), many=True)
+    land_district_codes = LandDistrictSerializer(
+        instance=LandDistrictCode.objects.all(), many=True)
+    liner_material_codes = LinerMaterialCodeSerializer(
+        instance=LinerMaterialCode.objects.all(), many=True)
+    ground_elevation_method_codes = GroundElevationMethodCodeSerializer(
+        instance=GroundElevationMethodCode.objects.all(), many=True)
+    drilling_method_codes = DrillingMethodCodeSerializer(
+        instance=DrillingMethodCode.objects.all(), many=True)
+    surface_seal_method_codes = SurfaceSealMethodCodeSerializer(
+        instance=SurfaceSealMethodCode.objects.all(), many=True)
+    surface_seal_material_codes = SurfaceSealMaterialCodeSerializer(
+        instance=SurfaceSealMaterialCode.objects.all(), many=True)
+    surficial_material_codes = SurficialMaterialCodeSerializer(
+        instance=SurficialMaterialCode.objects.all(), many=True)
+    screen_intake_methods = ScreenIntakeMethodSerializer(
+        instance=ScreenIntakeMethodCode.objects.all(), many=True)
+    screen_types = ScreenTypeCodeSerializer(instance=ScreenTypeCode.objects.all(), many=True)
+    screen_materials = ScreenMaterialCodeSerializer(instance=ScreenMaterialCode.objects.all(), many=True)
+    screen_openings = ScreenOpeningCodeSerializer(instance=ScreenOpeningCode.objects.all(), many=True)
+    screen_bottoms = ScreenBottomCodeSerializer(instance=ScreenBottomCode.objects.all(), many=True)
+    screen_assemblies = ScreenAssemblyTypeCodeSerializer(
+        instance=ScreenAssemblyTypeCode.objects.all(), many=True)
+    development_methods = DevelopmentMethodCodeSerializer(
+        instance=DevelopmentMethodCode.objects.all(), many=True)
+    yield_estimation_methods = YieldEstimationMethodCodeSerializer(
+        instance=YieldEstimationMethodCode.objects.all(), many=True)
+    water_quality_characteristics = WaterQualityCharacteristicSerializer(
+        instance=WaterQualityCharacteristic.objects.all(), many=True)
+    water_quality_colours = WaterQualityColourSerializer(
+        instance=WaterQualityColour.objects.all(), many=True)
+    well_status_codes = WellStatusCodeSerializer(
+        instance=WellStatusCode.objects.all(), many=True
+    )
+    well_publication_status_codes = WellPublicationStatusCodeSerializer(
+        instance=WellPublicationStatusCode.objects.all(), many=True
+    )
+    coordinate_acquisition_codes = CoordinateAcquisitionCodeSerializer(
+        instance=CoordinateAcquisitionCode.objects.all(), many=True)
+    observation_well_status = ObservationWellStatusCodeSerializer(
+        instance=ObsWellStatusCode.objects.all(), many=True
+    )
+
+    lithology_hardness = LithologyHardnessSerializer(instance=LithologyHardnessCode.objects.all(), many=True)
+    lithology_colours = LithologyColourSerializer(instance=LithologyColourCode.objects.all(), many=True)
+    lithology_materials = LithologyMaterialSerializer(instance=LithologyMaterialCode.objects.all(), many=True)
+    lithology_moisture = LithologyMoistureSerializer(instance=LithologyMoistureCode.objects.all(), many=True)
+    lithology_descriptors = LithologyDescriptionCodeSerializer(
+        instance=LithologyDescriptionCode.objects.all(), many=True)
+
+    root = urljoin('/', app_root, 'api/v1/')
+    for item in activity_codes.data:
+        if item['code'] not in ('LEGACY'):
+            item['path'] = reverse(item['code'])[len(root):]
+
+    options["province_codes"] = province_codes.data
+    options["activity_types"] = activity_codes.data
+    options["coordinate_acquisition_codes"] = coordinate_acquisition_codes.data
+    options["well_classes"] = well_class_codes.data
+    options["intended_water_uses"] = intended_water_use_codes.data
+    options["casing_codes"] = casing_codes.data
+    options["casing_materials"] = casing_material.data
+    options["decommission_materials"] = decommission_materials.data
+    options["decommission_methods"] = decommission_methods.data
+    options["filter_pack_material"] = filter_pack_material.data
+    options["filter_pack_material_size"] = filter_pack_material_size.data
+    options["land_district_codes"] = land_district_codes.data
+    options["liner_material_codes"] = liner_material_codes.data
+    options["screen_intake_methods"] = screen_intake_methods.data
+    options["ground_elevation_methods"] = ground_elevation_method_codes.data
+    options["drilling_methods"] = drilling_method_codes.data
+    options["surface_seal_methods"] = surface_seal_method_codes.data
+    options["surface_seal_materials"] = surface_seal_material_codes.data
+    options["surficial_material_codes"] = surficial_material_codes.data
+    options["screen_types"] = screen_types.data
+    options["screen_materials"] = screen_materials.data
+    options["screen_openings"] = screen_openings.data
+    options["screen_bottoms"] = screen_bottoms.data
+    options["screen_assemblies"] = screen_assemblies.data
+    options["development_methods"] = development_methods.data
+    options["yield_estimation_methods"] = yield_estimation_methods.data
+    options["water_quality_characteristics"] = water_quality_characteristics.data
+    options["water_quality_colours"] = water_quality_colours.data
+    options["lithology_hardness_codes"] = lithology_hardness.data
+    options["lithology_colours"] = lithology_colours.data
+    options["lithology_materials"] = lithology_materials.data
+    options["lithology_moisture_codes"] = lithology_moisture.data
+    options["lithology_descriptors"] = lithology_descriptors.data
+    options["well_status_codes"] = well_status_codes.data
+    options["well_publication_status_codes"] = well_publication_status_codes.data
+    options["observation_well_status"] = observation_well_status.data
+
+    return options
+
+
+# Seconds the submissions options are cached for (they are rebuilt sooner if a code table changes).
+OPTIONS_CACHE_TIMEOUT = 60 * 60
+
+
+def get_submissions_options():
+    """
+    Return the submissions options, and a strong ETag for them.
+    The options are cached for the current version of the code tables, which is shared by every process.
+    The ETag is a hash of the options, so every process gives the same options the same ETag.
+    """
+    key = 'submissions-options:{}'.format(code_tables.version())
+    cached = cache.get(key)
+    if cached is None:
+        options = build_submissions_options()
+        content = json.dumps(options, cls=DjangoJSONEncoder, sort_keys=True)
+        cached = (options, quote_etag(hashlib.sha1(content.encode('utf-8')).hexdigest()))
+        cache.set(key, cached, OPTIONS_CACHE_TIMEOUT)
+    return cached
+
+
 class SubmissionsOptions(APIView):
     """Options required for submitting activity report forms"""
 
     def get(self, request):
-        options = {}
-
-        province_codes = ProvinceStateCodeSerializer(
-            instance=ProvinceStateCode.objects.all(), many=True)
-        activity_codes = WellActivityCodeSerializer(
-            instance=WellActivityCode.objects.all(), many=True)
-        well_class_codes = WellClassCodeSerializer(
-            instance=WellClassCode.objects.prefetch_related("wellsubclasscode_set"), many=True)
-        intended_water_use_codes = IntendedWaterUseCodeSerializer(
-            instance=IntendedWaterUseCode.objects.all(), many=True)
-        casing_codes = CasingCodeSerializer(
-            instance=CasingCode.objects.all(), many=True)
-        casing_material = CasingMaterialSerializer(
-            instance=CasingMaterialCode.objects.all(), many=True)
-        decommission_materials = DecommissionMaterialCodeSerializer(
-            instance=DecommissionMaterialCode.objects.all(), many=True)
-        decommission_methods = DecommissionMethodCodeSerializer(
-            instance=DecommissionMethodCode.objects.all(), many=True)
-        filter_pack_material = FilterPackMaterialCodeSerializer(
-            instance=FilterPackMaterialCode.objects.all(), many=True)
-        filter_pack_material_size = FilterPackMaterialSizeCodeSerializer(
-            instance=FilterPackMaterialSizeCode.objects.all(), many=True)
-        land_district_codes = LandDistrictSerializer(
-            instance=LandDistrictCode.objects.all(), many=True)
-        liner_material_codes = LinerMaterialCodeSerializer(
-            instance=LinerMaterialCode.objects.all(), many=True)
-        ground_elevation_method_codes = GroundElevationMethodCodeSerializer(
-            instance=GroundElevationMethodCode.objects.all(), many=True)
-        drilling_method_codes = DrillingMethodCodeSerializer(
-            instance=DrillingMethodCode.objects.all(), many=True)
-        surface_seal_method_codes = SurfaceSealMethodCodeSerializer(
-            instance=SurfaceSealMethodCode.objects.all(), many=True)
-        surface_seal_material_codes = SurfaceSealMaterialCodeSerializer(
-            instance=SurfaceSealMaterialCode.objects.all(), many=True)
-        surficial_material_codes = SurficialMaterialCodeSerializer(
-            instance=SurficialMaterialCode.objects.all(), many=True)
-        screen_intake_methods = ScreenIntakeMethodSerializer(
-            instance=ScreenIntakeMethodCode.objects.all(), many=True)
-        screen_types = ScreenTypeCodeSerializer(instance=ScreenTypeCode.objects.all(), many=True)
-        screen_materials = ScreenMaterialCodeSerializer(instance=ScreenMaterialCode.objects.all(), many=True)
-        screen_openings = ScreenOpeningCodeSerializer(instance=ScreenOpeningCode.objects.all(), many=True)
-        screen_bottoms = ScreenBottomCodeSerializer(instance=ScreenBottomCode.objects.all(), many=True)
-        screen_assemblies = ScreenAssemblyTypeCodeSerializer(
-            instance=ScreenAssemblyTypeCode.objects.all(), many=True)
-        development_methods = DevelopmentMethodCodeSerializer(
-            instance=DevelopmentMethodCode.objects.all(), many=True)
-        yield_estimation_methods = YieldEstimationMethodCodeSerializer(
-            instance=YieldEstimationMethodCode.objects.all(), many=True)
-        water_quality_characteristics = WaterQualityCharacteristicSerializer(
-            instance=WaterQualityCharacteristic.objects.all(), many=True)
-        water_quality_colours = WaterQualityColourSerializer(
-            instance=WaterQualityColour.objects.all(), many=True)
-        well_status_codes = WellStatusCodeSerializer(
-            instance=WellStatusCode.objects.all(), many=True
-        )
-        well_publication_status_codes = WellPublicationStatusCodeSerializer(
-            instance=WellPublicationStatusCode.objects.all(), many=True
-        )
-        coordinate_acquisition_codes = CoordinateAcquisitionCodeSerializer(
-            instance=CoordinateAcquisitionCode.objects.all(), many=True)
-        observation_well_status = ObservationWellStatusCodeSerializer(
-            instance=ObsWellStatusCode.objects.all(), many=True
-        )
-
-        lithology_hardness = LithologyHardnessSerializer(instance=LithologyHardnessCode.objects.all(), many=True)
-        lithology_colours = LithologyColourSerializer(instance=LithologyColourCode.objects.all(), many=True)
-        lithology_materials = LithologyMaterialSerializer(instance=LithologyMaterialCode.objects.all(), many=True)
-        lithology_moisture = LithologyMoistureSerializer(instance=LithologyMoistureCode.objects.all(), many=True)
-        lithology_descriptors = LithologyDescriptionCodeSerializer(
-            instance=LithologyDescriptionCode.objects.all(), many=True)
-
-        root = urljoin('/', app_root, 'api/v1/')
-        for item in activity_codes.data:
-            if item['code'] not in ('LEGACY'):
-                item['path'] = reverse(item['code'])[len(root):]
-
-        options["province_codes"] = province_codes.data
-        options["activity_types"] = activity_codes.data
-        options["coordinate_acquisition_codes"] = coordinate_acquisition_codes.data
-        options["well_classes"] = well_class_codes.data
-        options["intended_water_uses"] = intended_water_use_codes.data
-        options["casing_codes"] = casing_codes.data
-        options["casing_materials"] = casing_material.data
-        options["decommission_materials"] = decommission_materials.data
-        options["decommission_methods"] = decommission_methods.data
-        options["filter_pack_material"] = filter_pack_material.data
-        options["filter_pack_material_size"] = filter_pack_material_size.data
-        options["land_district_codes"] = land_district_codes.data
-        options["liner_material_codes"] = liner_material_codes.data
-        options["screen_intake_methods"] = screen_intake_methods.data
-        options["ground_elevation_methods"] = ground_elevation_method_codes.data
-        options["drilling_methods"] = drilling_method_codes.data
-        options["surface_seal_methods"] = surface_seal_method_codes.data
-        options["surface_seal_materials"] = surface_seal_material_codes.data
-        options["surficial_material_codes"] = surficial_material_codes.data
-        options["screen_types"] = screen_types.data
-        options["screen_materials"] = screen_materials.data
-        options["screen_openings"] = screen_openings.data
-        options["screen_bottoms"] = screen_bottoms.data
-        options["screen_assemblies"] = screen_assemblies.data
-        options["development_methods"] = development_methods.data
-        options["yield_estimation_methods"] = yield_estimation_methods.data
-        options["water_quality_characteristics"] = water_quality_characteristics.data
-        options["water_quality_colours"] = water_quality_colours.data
-        options["lithology_hardness_codes"] = lithology_hardness.data
-        options["lithology_colours"] = lithology_colours.data
-        options["lithology_materials"] = lithology_materials.data
-        options["lithology_moisture_codes"] = lithology_moisture.data
-        options["lithology_descriptors"] = lithology_descriptors.data
-        options["well_status_codes"] = well_status_codes.data
-        options["well_publication_status_codes"] = well_publication_status_codes.data
-        options["observation_well_status"] = observation_well_status.data
-
-        return Response(options)
+        options, etag = get_submissions_options()
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(options)
+        response['ETag'] = etag
+        # The browser may keep the options, but has to check that they're still current.
+        response['Cache-Control'] = 'no-cache'
+        return response
 
 
 class SubmissionsHomeView(TemplateView):
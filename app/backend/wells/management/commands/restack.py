@@ -0,0 +1,125 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import logging
+import multiprocessing
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from wells.models import ActivitySubmission, Well, WellStackState
+from wells.stack import StackWells, submissions_hash
+
+# Run from command line :
+# python manage.py restack
+# python manage.py restack --start 1000 --end 2000 --workers 4
+# python manage.py restack --well 123 456 --force
+
+logger = logging.getLogger(__name__)
+
+
+def restack_batch(well_tag_numbers, force=False):
+    """
+    Re-stacks a batch of wells in a single transaction.
+    Returns the number of wells restacked, skipped (submissions unchanged since the last stack) and failed.
+    """
+    submissions = defaultdict(list)
+    for well_tag_number, filing_number in ActivitySubmission.objects \
+            .filter(well__in=well_tag_numbers) \
+            .values_list('well', 'filing_number'):
+        submissions[well_tag_number].append(filing_number)
+
+    if force:
+        outdated = well_tag_numbers
+    else:
+        stacked = dict(WellStackState.objects
+                       .filter(well__in=well_tag_numbers)
+                       .values_list('well', 'submissions_hash'))
+        outdated = [well_tag_number for well_tag_number in well_tag_numbers
+                    if stacked.get(well_tag_number) != submissions_hash(submissions[well_tag_number])]
+
+    restacked = 0
+    failed = 0
+    stacker = StackWells()
+    with transaction.atomic():
+        for well in Well.objects.filter(well_tag_number__in=outdated):
+            try:
+                # A well that fails to stack mustn't take the rest of the batch with it.
+                with transaction.atomic():
+                    stacker.restack(well)
+                restacked += 1
+            except Exception:
+                logger.exception('failed to restack well {}'.format(well.well_tag_number))
+                failed += 1
+
+    return restacked, len(well_tag_numbers) - len(outdated), failed
+
+
+def restack_worker(args):
+    return restack_batch(*args)
+
+
+class Command(BaseCommand):
+    help = 'Re-creates well records from their submissions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=int, help='Lowest well tag number to restack')
+        parser.add_argument('--end', type=int, help='Highest well tag number to restack')
+        parser.add_argument('--well', type=int, nargs='+', dest='wells', help='Well tag numbers to restack')
+        parser.add_argument('--workers', type=int, default=1, help='Number of worker processes')
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Number of wells committed in each transaction')
+        parser.add_argument('--force', action='store_true',
+                            help='Restack wells even if their submissions have not changed')
+
+    def handle(self, *args, **options):
+        # Only wells with submissions can be stacked.
+        well_tag_numbers = ActivitySubmission.objects.filter(well__isnull=False)
+        if options['start'] is not None:
+            well_tag_numbers = well_tag_numbers.filter(well__gte=options['start'])
+        if options['end'] is not None:
+            well_tag_numbers = well_tag_numbers.filter(well__lte=options['end'])
+        if options['wells']:
+            well_tag_numbers = well_tag_numbers.filter(well__in=options['wells'])
+        well_tag_numbers = list(well_tag_numbers.order_by('well').values_list('well', flat=True).distinct())
+
+        batch_size = options['batch_size']
+        batches = [well_tag_numbers[i:i + batch_size] for i in range(0, len(well_tag_numbers), batch_size)]
+        tasks = [(batch, options['force']) for batch in batches]
+
+        logger.info('restacking {} wells in {} batches'.format(len(well_tag_numbers), len(batches)))
+        if options['workers'] > 1:
+            # Worker processes can't share the database connection, close it so that each process opens
+            # its own.
+            connections.close_all()
+            with multiprocessing.Pool(options['workers']) as pool:
+                self.report(pool.imap_unordered(restack_worker, tasks), len(well_tag_numbers))
+        else:
+            self.report((restack_worker(task) for task in tasks), len(well_tag_numbers))
+
+        self.stdout.write(self.style.SUCCESS('restack complete'))
+
+    def report(self, results, total):
+        """ Writes progress and throughput as each batch completes """
+        start = time.time()
+        processed = restacked = skipped = failed = 0
+        for batch_restacked, batch_skipped, batch_failed in results:
+            restacked += batch_restacked
+            skipped += batch_skipped
+            failed += batch_failed
+            processed = restacked + skipped + failed
+            elapsed = time.time() - start
+            self.stdout.write('{}/{} wells ({} restacked, {} skipped, {} failed) {:.1f} wells/s'.format(
+                processed, total, restacked, skipped, failed, processed / elapsed if elapsed else 0))
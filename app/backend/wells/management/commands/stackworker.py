@@ -0,0 +1,46 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from wells.stack_jobs import run_stack_jobs
+
+# Run from command line :
+# python manage.py stackworker
+# python manage.py stackworker --once
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Stacks queued submissions onto wells (see ENABLE_ASYNC_STACKING)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Run the pending jobs and exit, instead of polling for new jobs')
+        parser.add_argument('--interval', type=float, default=2,
+                            help='Seconds to wait between polls when there are no jobs')
+
+    def handle(self, *args, **options):
+        logger.info('starting stack worker')
+        while True:
+            count = run_stack_jobs()
+            if count:
+                logger.info('ran {} stack jobs'.format(count))
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('stack worker complete'))
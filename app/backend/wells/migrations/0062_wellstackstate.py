@@ -0,0 +1,25 @@
+# Generated by Django 2.1.7 on 2019-02-20 18:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wells', '0061_auto_20190215_2251'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WellStackState',
+            fields=[
+                ('well', models.OneToOneField(db_column='well_tag_number', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stack_state', serialize=False, to='wells.Well')),
+                ('submissions_hash', models.CharField(max_length=40)),
+                ('stack_date', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'well_stack_state',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.1.7 on 2019-02-21 17:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wells', '0062_wellstackstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StackJob',
+            fields=[
+                ('create_user', models.CharField(max_length=60)),
+                ('create_date', models.DateTimeField(blank=True, null=True)),
+                ('update_user', models.CharField(max_length=60, null=True)),
+                ('update_date', models.DateTimeField(blank=True, null=True)),
+                ('stack_job_id', models.AutoField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('run_after', models.DateTimeField()),
+                ('error', models.TextField(blank=True, null=True)),
+                ('submission', models.ForeignKey(db_column='filing_number', on_delete=django.db.models.deletion.CASCADE, related_name='stack_jobs', to='wells.ActivitySubmission')),
+            ],
+            options={
+                'db_table': 'stack_job',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stackjob',
+            index=models.Index(fields=['status', 'run_after'], name='stack_job_status_run_after'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.1.7 on 2019-02-21 21:05
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wells', '0063_stackjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivitySubmissionDelta',
+            fields=[
+                ('submission', models.OneToOneField(db_column='filing_number', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='delta', serialize=False, to='wells.ActivitySubmission')),
+                ('schema_version', models.PositiveIntegerField()),
+                ('submission_update_date', models.DateTimeField()),
+                ('data', django.contrib.postgres.fields.jsonb.JSONField()),
+            ],
+            options={
+                'db_table': 'activity_submission_delta',
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.1.7 on 2019-02-22 16:48
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wells', '0064_activitysubmissiondelta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wellstackstate',
+            name='composite',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='wellstackstate',
+            name='last_submission',
+            field=models.ForeignKey(blank=True, db_column='last_filing_number', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='wells.ActivitySubmission'),
+        ),
+    ]
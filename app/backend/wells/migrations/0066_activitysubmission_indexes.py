@@ -0,0 +1,29 @@
+# Generated by Django 2.1.7 on 2019-02-25 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wells', '0065_wellstackstate_composite'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitysubmission',
+            index=models.Index(fields=['well_activity_type', 'filing_number'], name='act_sub_type_filing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitysubmission',
+            index=models.Index(fields=['person_responsible', 'filing_number'], name='act_sub_person_filing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitysubmission',
+            index=models.Index(fields=['company_of_person_responsible', 'filing_number'], name='act_sub_company_filing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitysubmission',
+            index=models.Index(fields=['create_date'], name='act_sub_create_date_idx'),
+        ),
+    ]
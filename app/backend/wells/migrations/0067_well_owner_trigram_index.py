@@ -0,0 +1,19 @@
+# Generated by Django 2.1.7 on 2019-03-01 18:20
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wells', '0066_activitysubmission_indexes'),
+    ]
+
+    # Trigram index for the well owner autocomplete (see gwells.autocomplete).
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(
+            'CREATE INDEX well_owner_full_name_trgm ON well USING gin (owner_full_name gin_trgm_ops)',
+            'DROP INDEX well_owner_full_name_trgm'),
+    ]
@@ -13,10 +13,12 @@
 """
 
 from django.contrib.gis.db import models
+from django.contrib.postgres.fields import JSONField
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 import uuid
 
+from gwells.codes import code_tables
 from gwells.models import AuditModel, ProvinceStateCode, ScreenIntakeMethodCode, ScreenMaterialCode,\
     ScreenOpeningCode, ScreenBottomCode, ScreenTypeCode, ScreenAssemblyTypeCode
 from gwells.models.lithology import (
@@ -376,23 +378,24 @@ class WellClassCode(AuditModel):
 class WellStatusCodeTypeManager(models.Manager):
     """
     Provides additional methods for returning well status codes that correspond
-    to activity submissions
+    to activity submissions. Codes come from the in memory code tables, they are shared, and must not be
+    modified.
     """
 
     # Construction reports correspond to "NEW" status
     def construction(self):
-        return self.get_queryset().get(well_status_code='NEW')
+        return code_tables.get(self.model, 'NEW')
 
     # Decommission reports trigger a "CLOSURE" status
     def decommission(self):
-        return self.get_queryset().get(well_status_code='CLOSURE')
+        return code_tables.get(self.model, 'CLOSURE')
 
     # Alteration reports trigger an "ALTERATION" status
     def alteration(self):
-        return self.get_queryset().get(well_status_code='ALTERATION')
+        return code_tables.get(self.model, 'ALTERATION')
 
     def other(self):
-        return self.get_queryset().get(well_status_code='OTHER')
+        return code_tables.get(self.model, 'OTHER')
 
 
 class WellStatusCode(AuditModel):
@@ -1321,6 +1324,14 @@ class ActivitySubmission(AuditModel):
 
     class Meta:
         db_table = 'activity_submission'
+        indexes = [
+            # Used to filter submissions (see submissions.filters.SubmissionListFilter) in filing number order.
+            models.Index(fields=['well_activity_type', 'filing_number'], name='act_sub_type_filing_idx'),
+            models.Index(fields=['person_responsible', 'filing_number'], name='act_sub_person_filing_idx'),
+            models.Index(fields=['company_of_person_responsible', 'filing_number'],
+                         name='act_sub_company_filing_idx'),
+            models.Index(fields=['create_date'], name='act_sub_create_date_idx'),
+        ]
 
     def __str__(self):
         if self.filing_number:
@@ -1623,3 +1634,77 @@ class DecommissionDescription(AuditModel):
     material = models.ForeignKey(DecommissionMaterialCode, db_column='decommission_material_code',
                                  on_delete=models.PROTECT)
     observations = models.CharField(max_length=255, null=True, blank=True)
+
+
+class WellStackState(models.Model):
+    """
+    Records the set of submissions a well was last stacked from, so that wells whose submissions
+    haven't changed don't need to be stacked again.
+    The composite the well was stacked from is kept along with the last submission applied to it, so
+    that a new submission ordered after it can be applied without replaying the well's history.
+    """
+    well = models.OneToOneField(Well, primary_key=True, db_column='well_tag_number',
+                                on_delete=models.CASCADE, related_name='stack_state')
+    submissions_hash = models.CharField(max_length=40)
+    stack_date = models.DateTimeField()
+    composite = JSONField(blank=True, null=True)
+    last_submission = models.ForeignKey(ActivitySubmission, db_column='last_filing_number',
+                                        on_delete=models.SET_NULL, blank=True, null=True,
+                                        related_name='+')
+
+    class Meta:
+        db_table = 'well_stack_state'
+
+    def __str__(self):
+        return '{} {}'.format(self.well_id, self.submissions_hash)
+
+
+class ActivitySubmissionDelta(models.Model):
+    """
+    The serialized form of a submission, as applied by the stacker, stored so that stacking a well
+    doesn't have to serialize its entire submission history again.
+    The delta is only used while schema_version and submission_update_date match the stacker and the
+    submission.
+    """
+    submission = models.OneToOneField(ActivitySubmission, primary_key=True, db_column='filing_number',
+                                      on_delete=models.CASCADE, related_name='delta')
+    schema_version = models.PositiveIntegerField()
+    submission_update_date = models.DateTimeField()
+    data = JSONField()
+
+    class Meta:
+        db_table = 'activity_submission_delta'
+
+    def __str__(self):
+        return '{} v{}'.format(self.submission_id, self.schema_version)
+
+
+class StackJob(AuditModel):
+    """
+    A request to stack a submission onto its well, processed by the stack worker.
+    """
+    PENDING = 'PENDING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    stack_job_id = models.AutoField(primary_key=True)
+    submission = models.ForeignKey(ActivitySubmission, db_column='filing_number',
+                                   on_delete=models.CASCADE, related_name='stack_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField()
+    error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'stack_job'
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='stack_job_status_run_after'),
+        ]
+
+    def __str__(self):
+        return '{} {} {}'.format(self.stack_job_id, self.submission_id, self.status)
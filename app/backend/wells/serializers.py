@@ -15,8 +15,9 @@ import logging
 
 from rest_framework import serializers
 from django.db import transaction
+from django.utils import timezone
 from gwells.models import ProvinceStateCode
-from gwells.serializers import AuditModelSerializer
+from gwells.serializers import AuditModelSerializer, CodeTableRelatedField
 from registries.serializers import PersonBasicSerializer, OrganizationNameListSerializer
 from wells.models import (
     ActivitySubmission,
@@ -303,6 +304,9 @@ class WellDetailAdminSerializer(AuditModelSerializer):
 
 class WellStackerSerializer(AuditModelSerializer):
 
+    # Codes are validated against the in memory code tables.
+    serializer_related_field = CodeTableRelatedField
+
     casing_set = CasingSerializer(many=True)
     screen_set = ScreenSerializer(many=True)
     linerperforation_set = LinerPerforationSerializer(many=True)
@@ -335,9 +339,11 @@ class WellStackerSerializer(AuditModelSerializer):
             foreign_class = FOREIGN_KEYS[key]
             if field.one_to_many:
                 # We just delete the one to many records. It would be too complicated to match them up.
-                for record in getattr(instance, key).all():
-                    record.delete()
+                getattr(instance, key).all().delete()
                 if records_data:
+                    # bulk_create doesn't call save(), so the audit dates have to be populated here.
+                    now = timezone.now()
+                    records = []
                     for record_data in records_data:
                         # We're re-creating this record, and binding it to the current instance, so we need
                         # to get rid of any redundant/duplicate reference that may exist in the record data
@@ -345,7 +351,9 @@ class WellStackerSerializer(AuditModelSerializer):
                         # variable)
                         record_data.pop('well', None)
                         # Create new instance of of the casing/screen/whatever record.
-                        obj = foreign_class.objects.create(well=instance, **record_data)
+                        records.append(foreign_class(well=instance, create_date=now, update_date=now,
+                                                     **record_data))
+                    foreign_class.objects.bulk_create(records)
             else:
                 raise 'UNEXPECTED FIELD! {}'.format(field)
         instance = super().update(instance, validated_data)
@@ -11,23 +11,51 @@
     See the License for the specific language governing permissions and
     limitations under the License.
 """
+import bisect
+import hashlib
+import itertools
+import json
 import logging
 import dateutil.parser
 
+from django.core.exceptions import ObjectDoesNotExist
 from django.core.serializers import serialize
+from django.core.serializers.json import DjangoJSONEncoder
 from django.forms.models import model_to_dict
 from django.db import transaction
-from django.db.models import F
+from django.db.models import F, prefetch_related_objects
+from django.utils import timezone
 
 from gwells.models import ProvinceStateCode
 from submissions.models import WellActivityCode
 import submissions.serializers
-from wells.models import Well, ActivitySubmission, WellStatusCode
+from wells.models import Well, ActivitySubmission, ActivitySubmissionDelta, WellStatusCode, WellStackState
 from wells.serializers import WellStackerSerializer
 
 
 logger = logging.getLogger(__name__)
 
+# Increment this whenever the stacking logic changes, so that every well is considered out of date and
+# gets re-stacked by the restack command.
+STACKER_VERSION = 1
+
+# Increment this whenever WellSubmissionStackerSerializer (or the serializers it nests) changes, so that
+# stored submission deltas are serialized again.
+SUBMISSION_DELTA_VERSION = 1
+
+# Related sets and many to many fields serialized for each submission, fetched up front so that
+# serializing several submissions doesn't query them one submission at a time.
+SUBMISSION_PREFETCH = (
+    'casing_set',
+    'screen_set',
+    'linerperforation_set',
+    'decommission_description_set',
+    'lithologydescription_set',
+    'drilling_methods',
+    'development_methods',
+    'water_quality_characteristics',
+)
+
 
 def overlap(a, b):
     """
@@ -40,6 +68,43 @@ def overlap(a, b):
     return intersect or overlap
 
 
+def submissions_hash(filing_numbers):
+    """
+    Returns a hash identifying a set of submissions, and the version of the stacking logic applied
+    to them.
+    """
+    values = ['v{}'.format(STACKER_VERSION)] + [str(filing_number) for filing_number in sorted(filing_numbers)]
+    return hashlib.sha1(','.join(values).encode('utf-8')).hexdigest()
+
+
+class OverlapIndex():
+    """
+    Answers whether an interval overlaps (as defined by overlap()) with any interval in a set, without
+    having to compare it against every interval in the set.
+
+    The intervals are sorted by start, along with a running maximum of their ends, so that checking
+    whether a point lies strictly inside any of them is a binary search. Identical starts and ends are
+    checked with set lookups. Building the index is O(n log n), and each query is O(log n).
+    """
+
+    def __init__(self, intervals):
+        intervals = sorted(intervals, key=lambda interval: interval[0])
+        self.starts = [start for start, _ in intervals]
+        self.max_ends = list(itertools.accumulate((end for _, end in intervals), max))
+        self.start_set = set(self.starts)
+        self.end_set = set(end for _, end in intervals)
+
+    def _contains(self, point):
+        # Intervals before i start before the point, if any of them ends after the point, it contains it.
+        i = bisect.bisect_left(self.starts, point)
+        return i > 0 and self.max_ends[i - 1] > point
+
+    def overlaps(self, interval):
+        start, end = interval
+        return (start in self.start_set or end in self.end_set or
+                self._contains(start) or self._contains(end))
+
+
 class StackWells():
 
     @transaction.atomic
@@ -48,7 +113,8 @@ class StackWells():
         Take a submission, and use it to create/update a well entry.
         As a side effect of calling this method, a legacy well record may be created if required.
         """
-        submission = ActivitySubmission.objects.get(
+        # The activity type and stored delta are read when stacking, so they're loaded up front.
+        submission = ActivitySubmission.objects.select_related('well_activity_type', 'delta').get(
             filing_number=filing_number)
         if submission.well is not None:
             # If there's already a well, we update it
@@ -58,8 +124,19 @@ class StackWells():
         well = self._stack(ActivitySubmission.objects.filter(filing_number=filing_number), well)
         submission.well = well
         submission.save()
+        # Linking the submission to the well doesn't change what gets stacked, so the delta stored
+        # while stacking is still current.
+        ActivitySubmissionDelta.objects.filter(submission=submission).update(
+            submission_update_date=submission.update_date)
         return well
 
+    @transaction.atomic
+    def restack(self, well: Well) -> Well:
+        """
+        Re-create a well record from its existing submissions.
+        """
+        return self._stack(ActivitySubmission.objects.filter(well=well), well)
+
     @transaction.atomic
     def _create_legacy_submission(self, well: Well) -> None:
         """
@@ -77,8 +154,10 @@ class StackWells():
         data = {k: v for (k, v) in data.items() if v is not None and v != ''}
         # Retain the well reference.
         data['well'] = well.well_tag_number
-        # De-serialize the well into a submission.
-        submission_serializer = submissions.serializers.WellSubmissionLegacySerializer(data=data)
+        # De-serialize the well into a submission. The caller stacks the well (if it needs to be), so the
+        # legacy submission isn't stacked on its own.
+        submission_serializer = submissions.serializers.WellSubmissionLegacySerializer(
+            data=data, context={'defer_stacking': True})
 
         # Validate the data, throwing an exception on error.
         if submission_serializer.is_valid(raise_exception=True):
@@ -87,6 +166,50 @@ class StackWells():
             return legacy
         return None
 
+    @transaction.atomic
+    def create_legacy_submission_if_required(self, well: Well):
+        """
+        If an existing well has no submissions, record its current information as a legacy submission.
+        This has to be done before submissions are added to a well that isn't stacked straight away
+        (e.g. a batch of submissions, or queued stacking), as _update_well_record only creates the legacy
+        submission when the submission being stacked is the well's only one.
+        """
+        # Lock the well, so that concurrent submissions don't each create a legacy submission.
+        Well.objects.select_for_update().get(well_tag_number=well.well_tag_number)
+        if ActivitySubmission.objects.filter(well=well).exists():
+            return None
+        return self._create_legacy_submission(well)
+
+    def _submission_deltas(self, records):
+        """
+        Return the serialized data of each submission, keyed by filing number.
+        Stored deltas are used where they are current, only new or changed submissions are serialized.
+        """
+        deltas = {}
+        stale = []
+        for submission in records:
+            try:
+                delta = submission.delta
+            except ObjectDoesNotExist:
+                delta = None
+            if (delta and delta.schema_version == SUBMISSION_DELTA_VERSION and
+                    delta.submission_update_date == submission.update_date):
+                deltas[submission.filing_number] = delta.data
+            else:
+                stale.append(submission)
+        if stale:
+            prefetch_related_objects(stale, *SUBMISSION_PREFETCH)
+            for submission in stale:
+                serializer = submissions.serializers.WellSubmissionStackerSerializer(submission)
+                # Round trip the data through json, so that a new delta is identical to a stored one.
+                data = json.loads(json.dumps(serializer.data, cls=DjangoJSONEncoder))
+                ActivitySubmissionDelta.objects.update_or_create(submission=submission, defaults={
+                    'schema_version': SUBMISSION_DELTA_VERSION,
+                    'submission_update_date': submission.update_date,
+                    'data': data})
+                deltas[submission.filing_number] = data
+        return deltas
+
     def _series_overlaps(self, record, record_set):
         # Return True if a record overlaps with a list of records
         for other_record in record_set:
@@ -95,17 +218,56 @@ class StackWells():
                 return True
         return False
 
+    def _remove_overlapping(self, prev_series, next_series):
+        # Return the records in prev_series that don't overlap with any record in next_series
+        depths = [record.get(key) for record in itertools.chain(prev_series, next_series)
+                  for key in ('start', 'end')]
+        if None not in depths:
+            try:
+                index = OverlapIndex([(record.get('start'), record.get('end')) for record in next_series])
+                return [record for record in prev_series
+                        if not index.overlaps((record.get('start'), record.get('end')))]
+            except TypeError:
+                # The depths can't be ordered.
+                pass
+        # Missing or unordered depths, compare each record in turn.
+        return [record for record in prev_series if not self._series_overlaps(record, next_series)]
+
     def _merge_series(self, prev_series, next_series):
         # Remove old records that overlap with new records
-        prev_series = [record for record in prev_series if not self._series_overlaps(record, next_series)]
+        prev_series = self._remove_overlapping(prev_series, next_series)
         # Join the old with the new
         new = prev_series + next_series
         # Sort
         new.sort(key=lambda record: (record.get('start'), record.get('end')))
         return new
 
-    @transaction.atomic
-    def _stack(self, records, well: Well) -> Well:
+    def _sort_key(self, submission: ActivitySubmission):
+        # Iterate through all the submission records
+        # We can't strictly order by the create date, we need to consider that construction/legacy well
+        # submission have to go 1st - in the following order:
+        # 1: legacy submissions
+        #   1.1: reason: Scenario. There is an existing well, a construction submission comes in, we have
+        #           to create a legacy submission to retain the wells information, and apply the
+        #           construction on top of that.
+        # 2: construction submissions
+        #   2.1: reason: A well should ideally always start with a construction submission. See 1.1 for
+        #           the exception to this rule.
+        # 3: create_date
+        #   3.1 reason: Submissions need to be considered in order.
+        #   3.2 exceptions: It may be, that two alterations are capture in the incorrect order. Logically,
+        #           the record dated earlier by the "work_start_date" should be considered 1st, and should
+        #           be captured 1st. We do however not have control over the order in which records are
+        #           captured. WE CURRENTLY DO NOT HANDLE THIS EXCEPTION. It is important that and EDIT be
+        #           processed ONLY based on it's create_date, not it's work_start_date.
+        return (submission.well_activity_type.code != WellActivityCode.types.legacy().code,
+                submission.well_activity_type.code != WellActivityCode.types.construction().code,
+                submission.create_date)
+
+    def _fold(self, composite, records, deltas):
+        """
+        Apply submissions, in order, to a composite.
+        """
         # TODO: Deal with Lithology, LtsaOwner, AquiferWell etc.
         # There isn't always a like to like mapping of values, sometimes the source key will differ from
         # the target key:
@@ -129,34 +291,9 @@ class StackWells():
         # filing number, well_activity_code etc.)
         target_keys = WellStackerSerializer().get_fields().keys()
 
-        # Iterate through all the submission records
-        # We can't strictly order by the create date, we need to consider that construction/legacy well
-        # submission have to go 1st - in the following order:
-        # 1: legacy submissions
-        #   1.1: reason: Scenario. There is an existing well, a construction submission comes in, we have
-        #           to create a legacy submission to retain the wells information, and apply the
-        #           construction on top of that.
-        # 2: construction submissions
-        #   2.1: reason: A well should ideally always start with a construction submission. See 1.1 for
-        #           the exception to this rule.
-        # 3: create_date
-        #   3.1 reason: Submissions need to be considered in order.
-        #   3.2 exceptions: It may be, that two alterations are capture in the incorrect order. Logically,
-        #           the record dated earlier by the "work_start_date" should be considered 1st, and should
-        #           be captured 1st. We do however not have control over the order in which records are
-        #           captured. WE CURRENTLY DO NOT HANDLE THIS EXCEPTION. It is important that and EDIT be
-        #           processed ONLY based on it's create_date, not it's work_start_date.
-        records = records.order_by('create_date')
-        records = sorted(records, key=lambda record:
-                         (record.well_activity_type.code != WellActivityCode.types.legacy().code,
-                          record.well_activity_type.code != WellActivityCode.types.construction().code,
-                          record.create_date))
-
         # these are depth-specific sets that have a "start" and "end" value
         FOREIGN_KEYS = ('casing_set', 'screen_set', 'linerperforation_set', 'decommission_description_set',)
 
-        composite = {}
-
         # Well status is set based on the most recent activity submission.
         well_status_map = {
             WellActivityCode.types.construction().code: WellStatusCode.types.construction().well_status_code,
@@ -170,8 +307,7 @@ class StackWells():
             composite['well_status'] = well_status_map.get(
                 submission.well_activity_type.code, WellStatusCode.types.other().well_status_code)
             source_target_map = activity_type_map.get(submission.well_activity_type.code, {})
-            serializer = submissions.serializers.WellSubmissionStackerSerializer(submission)
-            for source_key, value in serializer.data.items():
+            for source_key, value in deltas[submission.filing_number].items():
                 # We only consider items with values, and keys that are in our target
                 # an exception is STAFF_EDIT submissions (we need to be able to accept empty values)
                 if value or value is False or value == 0:
@@ -200,19 +336,73 @@ class StackWells():
                             composite[target_key] = self._merge_series(composite[source_key], value)
                         else:
                             composite[target_key] = value
+        return composite
 
+    def _save_composite(self, well: Well, composite, filing_numbers, last_submission) -> Well:
         # Update the well view
         well_serializer = WellStackerSerializer(well, data=composite, partial=True)
         if well_serializer.is_valid(raise_exception=True):
             well = well_serializer.save()
 
+        # Keep the composite, so that a submission ordered after last_submission can be applied to it
+        # without replaying the whole history.
+        WellStackState.objects.update_or_create(well=well, defaults={
+            'submissions_hash': submissions_hash(filing_numbers),
+            'stack_date': timezone.now(),
+            'composite': composite,
+            'last_submission': last_submission})
+
         return well
 
+    @transaction.atomic
+    def _stack(self, records, well: Well) -> Well:
+        records = records \
+            .select_related('well_activity_type', 'delta') \
+            .order_by('create_date')
+        records = sorted(records, key=self._sort_key)
+
+        deltas = self._submission_deltas(records)
+        composite = self._fold({}, records, deltas)
+
+        return self._save_composite(well, composite, [submission.filing_number for submission in records],
+                                    records[-1] if records else None)
+
+    def _stack_incremental(self, submission: ActivitySubmission):
+        """
+        Apply a single submission to the composite stored when the well was last stacked, if the
+        submission is ordered after every submission already applied to it (the usual case for
+        alterations and staff edits). Returns None if the well has to be stacked from its full history.
+        """
+        try:
+            state = WellStackState.objects \
+                .select_related('last_submission__well_activity_type') \
+                .get(well=submission.well)
+        except WellStackState.DoesNotExist:
+            return None
+        if state.composite is None or state.last_submission is None:
+            return None
+        filing_numbers = list(ActivitySubmission.objects
+                              .filter(well=submission.well)
+                              .exclude(filing_number=submission.filing_number)
+                              .values_list('filing_number', flat=True))
+        if state.submissions_hash != submissions_hash(filing_numbers):
+            # The composite wasn't built from the well's other submissions.
+            return None
+        if self._sort_key(submission) <= self._sort_key(state.last_submission):
+            # e.g. a legacy or construction submission, that has to be applied before the others.
+            return None
+        composite = self._fold(state.composite, [submission], self._submission_deltas([submission]))
+        return self._save_composite(submission.well, composite, filing_numbers + [submission.filing_number],
+                                    submission)
+
     @transaction.atomic
     def _update_well_record(self, submission: ActivitySubmission) -> Well:
         """
         Used to update an existing well record.
         """
+        well = self._stack_incremental(submission)
+        if well is not None:
+            return well
         records = ActivitySubmission.objects.filter(well=submission.well)
         if records.count() > 1:
             # If there's more than one submission we don't need to create a legacy well, we can safely
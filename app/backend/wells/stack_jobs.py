@@ -0,0 +1,86 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+from datetime import timedelta
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from wells.models import ActivitySubmission, StackJob, Well
+from wells.stack import StackWells
+
+
+logger = logging.getLogger(__name__)
+
+# A job that keeps failing is given up on after this many attempts.
+MAX_ATTEMPTS = 5
+# Seconds to wait before retrying a failed job, doubled with each attempt.
+RETRY_DELAY = 30
+
+
+def enqueue_stack(submission: ActivitySubmission, user: str = None) -> StackJob:
+    """
+    Queue up a submission to be stacked onto its well by the stack worker.
+    """
+    now = timezone.now()
+    return StackJob.objects.create(submission=submission, run_after=now, create_user=user or '')
+
+
+def run_next_stack_job():
+    """
+    Claim and run the oldest pending stack job. Returns the job, or None if there is nothing to do.
+    """
+    with transaction.atomic():
+        # Jobs that are being run by other workers are locked, and skipped.
+        job = StackJob.objects \
+            .select_for_update(skip_locked=True) \
+            .filter(status=StackJob.PENDING, run_after__lte=timezone.now()) \
+            .order_by('stack_job_id') \
+            .first()
+        if job is None:
+            return None
+
+        job.attempts += 1
+        try:
+            with transaction.atomic():
+                submission = ActivitySubmission.objects.get(filing_number=job.submission_id)
+                if submission.well_id:
+                    # Stacking of a well is serialized - jobs for the same well wait here until the well
+                    # is no longer being stacked by another worker.
+                    Well.objects.select_for_update().get(well_tag_number=submission.well_id)
+                StackWells().process(submission.filing_number)
+            job.status = StackJob.DONE
+            job.error = None
+        except Exception as e:
+            logger.exception('stack job {} failed'.format(job.stack_job_id))
+            job.error = str(e)
+            if job.attempts >= MAX_ATTEMPTS:
+                job.status = StackJob.FAILED
+            else:
+                job.run_after = timezone.now() + timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+        job.save()
+    return job
+
+
+def run_stack_jobs(limit=None):
+    """
+    Run pending stack jobs until there are none left (or the limit is reached).
+    Returns the number of jobs run.
+    """
+    count = 0
+    while limit is None or count < limit:
+        if run_next_stack_job() is None:
+            break
+        count += 1
+    return count
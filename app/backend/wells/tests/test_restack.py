@@ -0,0 +1,64 @@
+"""
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+from datetime import date
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from submissions.models import WellActivityCode
+from wells.models import ActivitySubmission, Well
+from wells.stack import StackWells
+
+
+class RestackTest(TestCase):
+
+    fixtures = ['wellsearch-codetables.json', ]
+
+    def setUp(self):
+        submission = ActivitySubmission.objects.create(
+            owner_full_name='Bob',
+            work_start_date=date(2018, 1, 1),
+            work_end_date=date(2018, 2, 1),
+            well_activity_type=WellActivityCode.types.construction(),
+            )
+        self.well = StackWells().process(submission.filing_number)
+
+    def test_unchanged_well_skipped(self):
+        # The well was stacked when the submission came in, so there's nothing to do.
+        out = StringIO()
+        call_command('restack', stdout=out)
+        self.assertIn('1/1 wells (0 restacked, 1 skipped, 0 failed)', out.getvalue())
+        self.assertIn('restack complete', out.getvalue())
+
+    def test_force_restack(self):
+        Well.objects.filter(well_tag_number=self.well.well_tag_number).update(owner_full_name='Joe')
+        out = StringIO()
+        call_command('restack', '--force', '--well', str(self.well.well_tag_number), stdout=out)
+        self.assertIn('1/1 wells (1 restacked, 0 skipped, 0 failed)', out.getvalue())
+        well = Well.objects.get(well_tag_number=self.well.well_tag_number)
+        self.assertEqual(well.owner_full_name, 'Bob')
+
+    def test_new_submission_restacked(self):
+        # A submission added without being stacked changes the submission set.
+        ActivitySubmission.objects.create(
+            owner_full_name='Joe',
+            well=self.well,
+            well_activity_type=WellActivityCode.types.staff_edit()
+            )
+        out = StringIO()
+        call_command('restack', '--start', str(self.well.well_tag_number), stdout=out)
+        self.assertIn('1/1 wells (1 restacked, 0 skipped, 0 failed)', out.getvalue())
+        well = Well.objects.get(well_tag_number=self.well.well_tag_number)
+        self.assertEqual(well.owner_full_name, 'Joe')
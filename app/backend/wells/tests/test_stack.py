@@ -12,14 +12,21 @@
     limitations under the License.
 """
 from datetime import date
+from decimal import Decimal
 import logging
+import random
+import re
+from unittest.mock import patch
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from gwells.models import ProvinceStateCode
-from wells.models import Well, ActivitySubmission, Casing, Screen, LinerPerforation
+from wells.models import (Well, ActivitySubmission, ActivitySubmissionDelta, Casing, Screen, LinerPerforation,
+                          WellStatusCode, WellStackState)
 from submissions.models import WellActivityCode
-from wells.stack import StackWells, overlap
+from wells.stack import StackWells, OverlapIndex, overlap, SUBMISSION_DELTA_VERSION
 from registries.models import Person
 
 
@@ -169,6 +176,55 @@ class SeriesMergeTest(TestCase):
         self.assertEqual(new, expected)
 
 
+class OverlapIndexTest(TestCase):
+    """
+    Compares OverlapIndex with checking overlap() against every interval, over randomly generated
+    series of intervals.
+    """
+
+    def setUp(self):
+        self.random = random.Random(42)
+
+    def random_series(self, depth=lambda value: value):
+        series = []
+        for _ in range(self.random.randint(0, 8)):
+            start = self.random.randint(0, 20)
+            end = self.random.randint(0, 20)
+            # Mostly well formed intervals, but also some where the start is after the end.
+            if self.random.random() < 0.8:
+                start, end = min(start, end), max(start, end)
+            series.append((depth(start), depth(end)))
+        return series
+
+    def assert_matches_overlap(self, depth=lambda value: value):
+        for _ in range(2000):
+            prev_series = self.random_series(depth)
+            next_series = self.random_series(depth)
+            index = OverlapIndex(next_series)
+            for interval in prev_series:
+                expected = any(overlap(interval, other) for other in next_series)
+                self.assertEqual(index.overlaps(interval), expected, (interval, next_series))
+
+    def test_integer_depths(self):
+        self.assert_matches_overlap()
+
+    def test_decimal_depths(self):
+        self.assert_matches_overlap(lambda value: Decimal(value) / 4)
+
+    def test_serialized_depths(self):
+        # The stacker compares depths as serialized by DRF (strings).
+        self.assert_matches_overlap(lambda value: '{}.00'.format(value))
+
+    def test_merge_series_matches_pairwise(self):
+        stacker = StackWells()
+        for _ in range(500):
+            prev_series = [{'start': start, 'end': end} for start, end in self.random_series()]
+            next_series = [{'start': start, 'end': end} for start, end in self.random_series()]
+            expected = [record for record in prev_series
+                        if not stacker._series_overlaps(record, next_series)]
+            self.assertEqual(stacker._remove_overlapping(prev_series, next_series), expected)
+
+
 class StackTest(TestCase):
 
     fixtures = ['wellsearch-codetables.json', ]
@@ -200,6 +256,32 @@ class StackTest(TestCase):
         submission = ActivitySubmission.objects.get(filing_number=submission.filing_number)
         self.assertEqual(well.well_tag_number, submission.well.well_tag_number)
 
+    def test_stored_delta_used_when_restacking(self):
+        # Stacking stores the serialized submission, which is used instead of serializing it again.
+        submission = ActivitySubmission.objects.create(
+            owner_full_name='Bob',
+            work_start_date=date(2018, 1, 1),
+            work_end_date=date(2018, 2, 1),
+            person_responsible=self.driller,
+            owner_province_state=self.province,
+            well_activity_type=WellActivityCode.types.construction(),
+            )
+        stacker = StackWells()
+        well = stacker.process(submission.filing_number)
+        delta = ActivitySubmissionDelta.objects.get(submission=submission)
+        self.assertEqual(delta.schema_version, SUBMISSION_DELTA_VERSION)
+        self.assertEqual(delta.data['owner_full_name'], 'Bob')
+        # Change the stored delta only, restacking should pick the change up.
+        delta.data['owner_full_name'] = 'Stored'
+        delta.save()
+        well = stacker.restack(well)
+        self.assertEqual(well.owner_full_name, 'Stored')
+        # Once the submission changes, the delta is serialized again.
+        submission.refresh_from_db()
+        submission.save()
+        well = stacker.restack(well)
+        self.assertEqual(well.owner_full_name, 'Bob')
+
     def test_construction_submission_no_current_well(self):
         # Creating a brand new well that we only have a construction submission for.
         owner_full_name = 'Bob'
@@ -243,6 +325,123 @@ class StackTest(TestCase):
         well = stacker.process(alteration.filing_number)
         self.assertEqual(new_owner_full_name, well.owner_full_name)
 
+    def test_alteration_applied_to_stored_composite(self):
+        # An alteration ordered after the construction is applied to the stored composite, without
+        # stacking the well's history again.
+        construction = ActivitySubmission.objects.create(
+            owner_full_name='Bob',
+            work_start_date=date(2018, 1, 1),
+            work_end_date=date(2018, 2, 1),
+            person_responsible=self.driller,
+            owner_province_state=self.province,
+            well_activity_type=WellActivityCode.types.construction(),
+            )
+        stacker = StackWells()
+        well = stacker.process(construction.filing_number)
+        alteration = ActivitySubmission.objects.create(
+            owner_full_name='Joe',
+            work_start_date=date(2018, 2, 1),
+            work_end_date=date(2018, 3, 1),
+            person_responsible=self.driller,
+            owner_province_state=self.province,
+            well_activity_type=WellActivityCode.types.alteration(),
+            well=well
+            )
+        with patch.object(StackWells, '_stack', side_effect=AssertionError('full stack')):
+            well = stacker.process(alteration.filing_number)
+        self.assertEqual(well.owner_full_name, 'Joe')
+        self.assertEqual(well.alteration_start_date, date(2018, 2, 1))
+        self.assertEqual(well.construction_start_date, date(2018, 1, 1))
+        self.assertEqual(well.stack_state.last_submission, alteration)
+        # Replaying the whole history gives the same composite.
+        composite = well.stack_state.composite
+        well = stacker.restack(well)
+        well.stack_state.refresh_from_db()
+        self.assertEqual(well.stack_state.composite, composite)
+
+    def test_construction_after_alteration_replays_history(self):
+        # A construction is ordered before alterations, so the well has to be stacked in full.
+        alteration = ActivitySubmission.objects.create(
+            owner_full_name='Joe',
+            person_responsible=self.driller,
+            owner_province_state=self.province,
+            well_activity_type=WellActivityCode.types.alteration(),
+            )
+        stacker = StackWells()
+        well = stacker.process(alteration.filing_number)
+        construction = ActivitySubmission.objects.create(
+            owner_full_name='Bob',
+            person_responsible=self.driller,
+            owner_province_state=self.province,
+            well_activity_type=WellActivityCode.types.construction(),
+            well=well
+            )
+        well = stacker.process(construction.filing_number)
+        # The alteration is still applied last.
+        self.assertEqual(well.owner_full_name, 'Joe')
+        self.assertEqual(well.stack_state.last_submission, alteration)
+
+    def test_stack_does_not_query_activity_or_status_codes(self):
+        # Activity and well status codes come from the in memory code tables, so restacking doesn't look
+        # them up, and doesn't make more queries for a well with more submissions.
+        construction = ActivitySubmission.objects.create(
+            owner_full_name='Bob',
+            person_responsible=self.driller,
+            owner_province_state=self.province,
+            well_activity_type=WellActivityCode.types.construction(),
+            )
+        stacker = StackWells()
+        well = stacker.process(construction.filing_number)
+        ActivitySubmission.objects.create(
+            owner_full_name='Joe',
+            person_responsible=self.driller,
+            owner_province_state=self.province,
+            well_activity_type=WellActivityCode.types.alteration(),
+            well=well
+            )
+        # Stack once, so that the submission deltas are stored.
+        stacker.restack(well)
+        with CaptureQueriesContext(connection) as context:
+            well = stacker.restack(well)
+        self.assertEqual(well.well_status.well_status_code,
+                         WellStatusCode.types.alteration().well_status_code)
+        for query in context.captured_queries:
+            table = re.search(r'\bFROM\s+"?(\w+)"?', query['sql'], re.IGNORECASE)
+            if table:
+                self.assertNotIn(table.group(1), ('well_activity_code', 'well_status_code'), query['sql'])
+
+        for owner_full_name in ('Jim', 'Jack'):
+            ActivitySubmission.objects.create(
+                owner_full_name=owner_full_name,
+                person_responsible=self.driller,
+                owner_province_state=self.province,
+                well_activity_type=WellActivityCode.types.decommission(),
+                well=well
+                )
+        stacker.restack(well)
+        with self.assertNumQueries(len(context.captured_queries)):
+            well = stacker.restack(well)
+        self.assertEqual(well.well_status.well_status_code,
+                         WellStatusCode.types.decommission().well_status_code)
+
+        # Applying a new submission to the stored stack state doesn't look them up either.
+        self.assertTrue(WellStackState.objects.filter(well=well).exists())
+        alteration = ActivitySubmission.objects.create(
+            owner_full_name='Jill',
+            person_responsible=self.driller,
+            owner_province_state=self.province,
+            well_activity_type=WellActivityCode.types.alteration(),
+            well=well
+            )
+        with patch.object(StackWells, '_stack', side_effect=AssertionError('full stack')), \
+                CaptureQueriesContext(connection) as context:
+            well = stacker.process(alteration.filing_number)
+        self.assertEqual(well.owner_full_name, 'Jill')
+        for query in context.captured_queries:
+            table = re.search(r'\bFROM\s+"?(\w+)"?', query['sql'], re.IGNORECASE)
+            if table:
+                self.assertNotIn(table.group(1), ('well_activity_code', 'well_status_code'), query['sql'])
+
     def test_alteration_submission_to_legacy_well(self):
         # The well already exists, but has no construction submission.
         original_full_name = 'Bob'
@@ -436,3 +635,32 @@ class StackTest(TestCase):
         well = stacker.process(submission.filing_number)
 
         self.assertEqual(new_full_name, well.owner_full_name)
+
+    def test_alteration_casings_merged_with_construction(self):
+        # Casings from an alteration replace the overlapping casings from the construction, the rest
+        # are carried over.
+        construction = ActivitySubmission.objects.create(
+            work_start_date=date(2018, 1, 1),
+            work_end_date=date(2018, 2, 1),
+            well_activity_type=WellActivityCode.types.construction(),
+            )
+        Casing.objects.create(start=0, end=10, diameter=6, activity_submission=construction)
+        Casing.objects.create(start=10, end=20, diameter=6, activity_submission=construction)
+        stacker = StackWells()
+        well = stacker.process(construction.filing_number)
+        self.assertEqual(well.casing_set.count(), 2)
+
+        alteration = ActivitySubmission.objects.create(
+            work_start_date=date(2018, 3, 1),
+            work_end_date=date(2018, 4, 1),
+            well_activity_type=WellActivityCode.types.alteration(),
+            well=well
+            )
+        Casing.objects.create(start=0, end=10, diameter=8, activity_submission=alteration)
+        well = stacker.process(alteration.filing_number)
+
+        casings = list(Casing.objects.filter(well=well).order_by('start'))
+        self.assertEqual(len(casings), 2)
+        self.assertEqual(casings[0].diameter, 8)
+        self.assertEqual(casings[1].diameter, 6)
+        self.assertIsNotNone(casings[0].create_date)
@@ -32,6 +32,7 @@ from django_filters import rest_framework as restfilters
 from minio import Minio
 
 from gwells import settings
+from gwells.autocomplete import AutocompleteMixin
 from gwells.documents import MinioClient
 from gwells.models import Survey
 from gwells.roles import WELLS_VIEWER_ROLE, WELLS_EDIT_ROLE
@@ -102,7 +103,9 @@ class ListExtracts(APIView):
                             access_key=get_env_variable('S3_PUBLIC_ACCESS_KEY'),
                             secret_key=get_env_variable('S3_PUBLIC_SECRET_KEY'),
                             secure=use_secure)
+        # Other extracts (e.g. the registries extracts) are kept in folders of their own, which are skipped.
         objects = minioClient.list_objects(get_env_variable('S3_WELL_EXPORT_BUCKET'))
+        objects = (document for document in objects if not document.is_dir)
         urls = list(
             map(
                 lambda document: {
@@ -210,7 +213,7 @@ class WellListAPIView(ListAPIView):
         return Response(serializer.data)
 
 
-class WellTagSearchAPIView(ListAPIView):
+class WellTagSearchAPIView(AutocompleteMixin, ListAPIView):
     """ seach for wells by tag or owner """
 
     permission_classes = (DjangoModelPermissionsOrAnonReadOnly,)
@@ -226,6 +229,8 @@ class WellTagSearchAPIView(ListAPIView):
         'well_tag_number',
         'owner_full_name',
     )
+    autocomplete_fields = ('owner_full_name',)
+    autocomplete_number_fields = ('well_tag_number',)
 
 
 class PreSignedDocumentKey(APIView):